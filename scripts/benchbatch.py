@@ -0,0 +1,64 @@
+#!/opt/homebrew/bin/python3
+
+import os, sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import random
+import time
+from scripts.localoverpass import LocalOverpass
+from src import quadtree
+
+# compares one Overpass query per dangling node against batched node(id:a,b,c) queries, using a local stand-in server
+# with a fixed round trip latency so the numbers do not depend on the public API
+# python scripts/benchbatch.py [nodes] [batch size] [latency] [json folder], a synthetic grid of roads is served without a folder
+
+
+# a square grid of two way motorways roughly a mile apart
+def gridWays(size: int) -> dict:
+    ways = {}
+    node = lambda i, j: {'id': i * size + j + 1, 'lat': 35 + i * 0.015, 'long': -100 + j * 0.018}
+    for i in range(size):
+        for j in range(size):
+            for di, dj in [(0, 1), (1, 0)]:
+                if i + di < size and j + dj < size:
+                    start = node(i, j)
+                    end = node(i + di, j + dj)
+                    length = quadtree.getDistance([start['lat'], start['long']], [end['lat'], end['long']])
+                    ways[len(ways) + 1] = {'id': len(ways) + 1, 'length_mi': length, 'time_s': length / 65 * 3600,
+                                           'tags': {'highway': 'motorway', 'maxspeed': '65 mph'}, 'startNode': start, 'endNode': end}
+    return ways
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    batchSize = int(sys.argv[2]) if len(sys.argv) > 2 else 16
+    latency = float(sys.argv[3]) if len(sys.argv) > 3 else 0.1
+    server = LocalOverpass.fromTiles(sys.argv[4], latency=latency) if len(sys.argv) > 4 else LocalOverpass(gridWays(100), latency=latency)
+    server.start()
+
+    tree = quadtree.QuadTree(quadtree.BoundingBox([24, -128], [50, -65]), quadtree.NodeIndex())
+    tree.overpassUrl = server.url
+    random.seed(0)
+    nodeIds = random.sample(sorted(server.byNode), min(count, len(server.byNode)))
+
+    duration = time.time()
+    single = {nodeId: tree.fetchNeighborRoads(nodeId) for nodeId in nodeIds}
+    duration = time.time() - duration
+    requests = server.requests
+    print(f'Unbatched: {len(nodeIds)} nodes in {requests} requests, {duration:.2f} s, {len(nodeIds) / duration:.1f} nodes/s')
+
+    duration = time.time()
+    batched = {}
+    for i in range(0, len(nodeIds), batchSize):
+        batched.update(tree.fetchNeighborRoadsBatch(nodeIds[i:i + batchSize]))
+    duration = time.time() - duration
+    requests = server.requests - requests
+    print(f'Batched ({batchSize}): {len(nodeIds)} nodes in {requests} requests, {duration:.2f} s, {len(nodeIds) / duration:.1f} nodes/s')
+
+    # both ways of asking have to hand every node the same roads
+    same = all(sorted(w['id'] for w in single[n]) == sorted(w['id'] for w in batched[n]) for n in nodeIds)
+    print(f'Results match: {same}')
+    server.stop()
+
+
+if __name__ == '__main__':
+    main()
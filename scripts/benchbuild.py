@@ -0,0 +1,70 @@
+#!/opt/homebrew/bin/python3
+
+import os, sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import random
+import time
+from scripts.benchbatch import gridWays
+from src import quadtree, tilestore
+
+# compares growing the quadtree one road at a time with QuadTree.build, and checks both trees pick the same end ways
+# python scripts/benchbuild.py [json folder] [queries], a synthetic grid of roads is used without a folder
+
+BOUNDS = [[24.164785, -127.826991], [49.726580, -65.641307]]
+
+
+# number of leaves in a tree
+def leaves(tree: quadtree.QuadTree) -> int:
+    count = 0
+    stack = [tree]
+    while stack:
+        t = stack.pop()
+        if t.ul:
+            stack.extend([t.ul, t.ur, t.ll, t.lr])
+        else:
+            count += 1
+    return count
+
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] != '-':
+        folder = sys.argv[1]
+        data = [way for fileName in os.listdir(folder) if tilestore.isTile(fileName) for way in tilestore.iterWays(os.path.join(folder, fileName))]
+    else:
+        data = list(gridWays(300).values())
+    queries = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+
+    # both trees get their own Way objects so neither build is helped by the other
+    ways = [quadtree.Way(way) for way in data]
+    duration = time.time()
+    added = quadtree.QuadTree(quadtree.BoundingBox(*BOUNDS), quadtree.NodeIndex())
+    for way in ways:
+        added.add(way)
+    duration = time.time() - duration
+    print(f'add:   {len(added.index.ways)} roads in {duration:.2f} s, depth {added.depth()}, {leaves(added)} leaves')
+
+    ways = [quadtree.Way(way) for way in data]
+    duration = time.time()
+    built = quadtree.QuadTree.build(quadtree.BoundingBox(*BOUNDS), ways, quadtree.NodeIndex())
+    duration = time.time() - duration
+    print(f'build: {len(built.index.ways)} roads in {duration:.2f} s, depth {built.depth()}, {leaves(built)} leaves')
+
+    # random start and end points around the roads we have
+    random.seed(0)
+    lats = [w.start.lat for w in ways]
+    lons = [w.start.lon for w in ways]
+    points = [[random.uniform(min(lats), max(lats)), random.uniform(min(lons), max(lons))] for _ in range(2 * queries)]
+
+    times = []
+    answers = []
+    for tree in [added, built]:
+        duration = time.time()
+        ends = [tree.getEndWays(points[2 * i], points[2 * i + 1]) for i in range(queries)]
+        times.append(time.time() - duration)
+        answers.append([(e['start'].id if e['start'] else None, e['end'].id if e['end'] else None) for e in ends])
+    print(f'{queries} getEndWays: add {times[0]:.2f} s, build {times[1]:.2f} s')
+    print(f'Results match: {answers[0] == answers[1]}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+#!/opt/homebrew/bin/python3
+
+import os, sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import contextlib
+import io
+import random
+from src.hwnetwork import network
+from src.highwayRouter import HighwayRouter
+
+# compares routing from the single nearest start and end ways against one search over k candidates at each end, and against
+# retrying a search for every pair of candidates, on random points inside the loaded network
+# run from the project root so the json folder can be found: python scripts/benchcandidates.py [routes] [k] [snapshot]
+
+
+# access cost at both ends plus the cost of the roads driven, in the units of the router's metric
+def totalCost(router, route, candidates):
+    access = {way.id: cost for cost, way in candidates['start']}
+    exits = {way.id: cost for cost, way in candidates['end']}
+    driven = route['time_s'] if router.metric == 'time' else route['length_m']
+    return access[route['path'][0].id] + driven + exits[route['path'][-1].id]
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    k = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    hw = network.from_snapshot(sys.argv[3], overpass='offline') if len(sys.argv) > 3 else network(overpass='offline')
+
+    single = HighwayRouter(hw, None, 10**7, engine='graph')
+    multi = HighwayRouter(hw, None, 10**7, engine='graph', candidates=k)
+
+    # random pairs of points around the roads we have
+    random.seed(0)
+    lats = [way.start.lat for way in hw.tree.index.ways.values()]
+    lons = [way.start.lon for way in hw.tree.index.ways.values()]
+    point = lambda: [random.uniform(min(lats), max(lats)), random.uniform(min(lons), max(lons))]
+
+    costs = [0, 0, 0]
+    searched = [0, 0, 0]
+    routes = 0
+    for _ in range(count):
+        start, end = point(), point()
+
+        # the searches print how far they got, which we do not need here
+        with contextlib.redirect_stdout(io.StringIO()):
+            candidates = multi.getCandidates(start, end)
+            nearest = single.route(*start, *end)
+            if not nearest or not candidates['start'] or not candidates['end']:
+                continue
+            costs[0] += totalCost(single, nearest, candidates)
+            searched[0] += single.searched
+
+            best = multi.route(*start, *end)
+            costs[1] += totalCost(multi, best, candidates)
+            searched[1] += multi.searched
+
+            # retrying every pair of snaps finds the same best route, but pays for a whole search each time
+            retry = float('inf')
+            for access, startWay in candidates['start']:
+                for exit, endWay in candidates['end']:
+                    route = single.routeGraph(startWay, endWay)
+                    searched[2] += single.searched
+                    if route['path'][-1].id == endWay.id:
+                        retry = min(retry, access + route['length_m'] + exit)
+            costs[2] += retry
+        routes += 1
+
+    for label, cost, expanded in zip(['Nearest ways', f'{k} candidates, one search', f'{k} candidates, {k * k} searches'], costs, searched):
+        print(f'{label}: total cost {cost:.1f}, {expanded} nodes searched over {routes} routes')
+
+
+if __name__ == '__main__':
+    main()
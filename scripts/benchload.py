@@ -0,0 +1,43 @@
+#!/opt/homebrew/bin/python3
+
+import os, sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import resource
+import subprocess
+import time
+
+# compares network startup from the json folder in one process against the parallel process pool load
+# run from the project root so the json folder can be found: python scripts/benchload.py [workers]
+# every load runs in a fresh interpreter so its peak memory is measured on its own
+
+
+# loads the network once and prints wall time, the number of roads and peak RSS in MB of the loader and its worker processes
+def run(workers: int) -> None:
+    from src.hwnetwork import network
+
+    duration = time.time()
+    hw = network(workers=workers)
+    duration = time.time() - duration
+
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    scale = 1e6 if sys.platform == 'darwin' else 1e3
+    parent = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / scale
+    print(f'{duration} {len(hw.tree.index.ways)} {parent} {children}')
+
+
+def main():
+    if len(sys.argv) > 2 and sys.argv[1] == '--run':
+        run(int(sys.argv[2]))
+        return
+
+    workers = int(sys.argv[1]) if len(sys.argv) > 1 else os.cpu_count()
+    for label, count in [('Sequential', 1), (f'Parallel ({workers} processes)', workers)]:
+        output = subprocess.run([sys.executable, __file__, '--run', str(count)], capture_output=True, text=True, check=True).stdout
+        duration, ways, parent, children = output.split()[-4:]
+        print(f'{label}: {int(ways)} roads in {float(duration):.2f} s, peak RSS {float(parent):.0f} MB'
+              + (f' (largest worker {float(children):.0f} MB)' if count > 1 else ''))
+
+
+if __name__ == '__main__':
+    main()
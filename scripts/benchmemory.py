@@ -0,0 +1,94 @@
+#!/opt/homebrew/bin/python3
+
+import os, sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import time
+import tracemalloc
+from scripts.benchbatch import gridWays
+from src import quadtree, tilestore
+
+# reports how many bytes every loaded road costs with the old data model, where each way had a __dict__, its own copy of both
+# end nodes and its own tags, against the slotted ways with shared nodes and tags the network uses now
+# python scripts/benchmemory.py [json folder], a synthetic grid of roads is used without a folder
+
+BOUNDS = [[24.164785, -127.826991], [49.726580, -65.641307]]
+
+
+# copies of Node and Way as they were before they got __slots__, kept here only to measure against
+class LegacyNode:
+    def __init__(self, data: dict) -> None:
+        self.id = data['id']
+        self.lat = data['lat']
+        self.lon = data['long']
+
+
+class LegacyWay:
+    def __init__(self, data: dict) -> None:
+        self.id = data['id']
+        self.length = data['length_mi']
+        self.time = data['time_s']
+        self.tags = data['tags']
+        self.start = LegacyNode(data['startNode'])
+        self.end = LegacyNode(data['endNode'])
+        self.oneway = True if 'oneway' in self.tags and self.tags['oneway'] == 'yes' else False
+        self.forward = True
+        self._reverse = None
+
+
+# the old node index, which kept whatever nodes and tags each way came with
+class LegacyIndex(quadtree.NodeIndex):
+    def add(self, way) -> bool:
+        if way.id in self.ways:
+            return False
+        self.ways[way.id] = way
+        edges = [way] if way.oneway or way.start.id == way.end.id else [way, reverse(way)]
+        for edge in edges:
+            self.outgoing.setdefault(edge.start.id, []).append(edge)
+            self.incoming.setdefault(edge.end.id, []).append(edge)
+        return True
+
+
+def reverse(way: LegacyWay) -> LegacyWay:
+    if way._reverse is None:
+        r = LegacyWay.__new__(LegacyWay)
+        r.id, r.length, r.time, r.tags, r.start, r.end, r.oneway = way.id, way.length, way.time, way.tags, way.end, way.start, way.oneway
+        r.forward = not way.forward
+        r._reverse = way
+        way._reverse = r
+    return way._reverse
+
+
+# builds a network from fresh copies of the road dictionaries and returns (roads, bytes still held, seconds)
+def measure(data: list, wayClass, indexClass) -> tuple:
+    tracemalloc.start()
+    duration = time.time()
+    tree = quadtree.QuadTree.build(quadtree.BoundingBox(*BOUNDS), [wayClass(way) for way in decode(data)], indexClass())
+    duration = time.time() - duration
+    held = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    roads = len(tree.index.ways)
+    del tree
+    return roads, held, duration
+
+
+# road dictionaries are re-read for every run the way the loader reads them, so each model gets its own tags and node dicts
+def decode(data: list):
+    if isinstance(data, str):
+        for fileName in os.listdir(data):
+            if tilestore.isTile(fileName):
+                yield from tilestore.iterWays(os.path.join(data, fileName))
+    else:
+        for way in data:
+            yield {**way, 'tags': dict(way['tags']), 'startNode': dict(way['startNode']), 'endNode': dict(way['endNode'])}
+
+
+def main():
+    data = sys.argv[1] if len(sys.argv) > 1 else list(gridWays(200).values())
+
+    for label, wayClass, indexClass in [('Before', LegacyWay, LegacyIndex), ('After', quadtree.Way, quadtree.NodeIndex)]:
+        roads, held, duration = measure(data, wayClass, indexClass)
+        print(f'{label}: {roads} roads, {held / 1e6:.1f} MB, {held / roads:.0f} bytes per road, built in {duration:.2f} s')
+
+
+if __name__ == '__main__':
+    main()
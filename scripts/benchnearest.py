@@ -0,0 +1,68 @@
+#!/opt/homebrew/bin/python3
+
+import os, sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import random
+import time
+from scripts.benchbatch import gridWays
+from src import quadtree, tilestore
+
+# checks QuadTree.nearestWays against scanning every road on random points over the lower 48, and times both
+# python scripts/benchnearest.py [json folder] [queries] [k], a synthetic grid of roads is used without a folder
+
+BOUNDS = [[24.164785, -127.826991], [49.726580, -65.641307]]
+
+
+# the k nearest accepted ways to point by looking at every road in the index
+# road ends outside the tree's bounds were never put in the tree, so they are left out here too
+def bruteForce(tree: quadtree.QuadTree, point: list, k: int, f: str, accept) -> list:
+    found = []
+    for way in tree.index.ways.values():
+        node = way.start if f == 'start' else way.end
+        if accept(way) and tree.bounds.containsNode(node):
+            found.append((quadtree.getDistance(point, [node.lat, node.lon]), way))
+    found.sort(key=lambda pair: (pair[0], pair[1].id))
+    return found[:k]
+
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] != '-':
+        folder = sys.argv[1]
+        data = [way for fileName in os.listdir(folder) if tilestore.isTile(fileName) for way in tilestore.iterWays(os.path.join(folder, fileName))]
+    else:
+        data = list(gridWays(200).values())
+    queries = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+    k = int(sys.argv[3]) if len(sys.argv) > 3 else 5
+
+    tree = quadtree.QuadTree.build(quadtree.BoundingBox(*BOUNDS), [quadtree.Way(way) for way in data], quadtree.NodeIndex())
+
+    random.seed(0)
+    pairs = [([random.uniform(BOUNDS[0][0], BOUNDS[1][0]), random.uniform(BOUNDS[0][1], BOUNDS[1][1])],
+              [random.uniform(BOUNDS[0][0], BOUNDS[1][0]), random.uniform(BOUNDS[0][1], BOUNDS[1][1])]) for _ in range(queries)]
+
+    times = [0, 0]
+    same = 0
+    for start, end in pairs:
+        for f in ['start', 'end']:
+            point = start if f == 'start' else end
+            accept = tree.heading(start, end, f)
+
+            duration = time.time()
+            fast = tree.nearestWays(point, k, f, accept)
+            times[0] += time.time() - duration
+
+            duration = time.time()
+            slow = bruteForce(tree, point, k, f, accept)
+            times[1] += time.time() - duration
+
+            # ways the same distance away are ranked by id on both sides
+            same += [way.id for d, way in fast] == [way.id for d, way in slow]
+
+    print(f'{len(tree.index.ways)} roads, {2 * queries} searches for the {k} nearest ways')
+    print(f'nearestWays: {times[0] / (2 * queries) * 1000:.3f} ms per search')
+    print(f'Brute force: {times[1] / (2 * queries) * 1000:.3f} ms per search')
+    print(f'Results match: {same} of {2 * queries}')
+
+
+if __name__ == '__main__':
+    main()
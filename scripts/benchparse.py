@@ -0,0 +1,83 @@
+#!/opt/homebrew/bin/python3
+
+import os, sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import io
+import json
+import time
+import tracemalloc
+from scripts import overpy
+from scripts.benchbatch import gridWays
+from scripts.localoverpass import LocalOverpass
+
+# compares the full overpy parse against the lean parse on one large tile shaped response
+# python scripts/benchparse.py [grid size] [shape nodes], the response holds about 2 * size^2 roads with a realistic spread of tags,
+# each drawn through a number of shape nodes between its ends like real OSM ways
+
+KEEP_TAGS = ['highway', 'lanes', 'maxspeed', 'name', 'oneway', 'ref', 'surface']
+
+
+# runs a parse once for its time and again under tracemalloc for its peak memory, since tracing slows everything down
+def measure(parse) -> tuple:
+    duration = time.time()
+    parse()
+    duration = time.time() - duration
+    tracemalloc.start()
+    parse()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return duration, peak
+
+
+# adds shape nodes along every way of a stand-in response, numbered after the real nodes
+def addShape(response: dict, count: int) -> None:
+    elements = response['elements']
+    nodes = {e['id']: e for e in elements if e['type'] == 'node'}
+    nextId = max(nodes, default=0) + 1
+    for element in [e for e in elements if e['type'] == 'way']:
+        start, end = nodes[element['nodes'][0]], nodes[element['nodes'][-1]]
+        shape = []
+        for i in range(1, count + 1):
+            f = i / (count + 1)
+            elements.append({'type': 'node', 'id': nextId, 'lat': start['lat'] + (end['lat'] - start['lat']) * f, 'lon': start['lon'] + (end['lon'] - start['lon']) * f})
+            shape.append(nextId)
+            nextId += 1
+        element['nodes'] = [element['nodes'][0]] + shape + [element['nodes'][-1]]
+
+
+def main():
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    shape = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    ways = gridWays(size)
+    for way in ways.values():
+        way['tags'].update({'name': 'Interstate', 'ref': 'I 90', 'lanes': '2', 'oneway': 'no', 'surface': 'asphalt',
+                            'tiger:county': 'Somewhere', 'tiger:cfcc': 'A15', 'old_ref': 'US 10', 'hgv': 'designated'})
+    response = LocalOverpass(ways).answer('[bbox:-90,-180,90,180]')
+    addShape(response, shape)
+    response = json.dumps(response).encode('utf-8')
+    api = overpy.Overpass()
+
+    def full():
+        result = api.parse_json_stream(io.BytesIO(response))
+        for length in result._lengths.values():
+            way = result.get_way(length.id)
+            tags = {tag: val for tag, val in way.tags.items() if tag in KEEP_TAGS}
+            start, end = way.nodes[0], way.nodes[-1]
+            float(length.length), float(start.lat), float(start.lon), float(end.lat), float(end.lon)
+
+    def lean():
+        result = api.parse_json_lean(io.BytesIO(response), KEEP_TAGS)
+        for wayId, meters in result.lengths.items():
+            nodeIds, tags = result.ways[wayId]
+            result.nodes[nodeIds[0]], result.nodes[nodeIds[-1]]
+
+    print(f'Response: {len(ways)} roads, {len(response) / 1e6:.1f} MB')
+    fullTime, fullPeak = measure(full)
+    print(f'Full parse: {fullTime:.2f} s, {fullPeak / 1e6:.1f} MB peak')
+    leanTime, leanPeak = measure(lean)
+    print(f'Lean parse: {leanTime:.2f} s, {leanPeak / 1e6:.1f} MB peak')
+    print(f'{fullTime / leanTime:.1f}x faster, {fullPeak / leanPeak:.1f}x less memory')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+#!/opt/homebrew/bin/python3
+
+import os, sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import copy
+import heapq
+import time
+from src.hwnetwork import network
+from src.highwayRouter import HighwayRouter
+from src.quadtree import getDistance
+
+# compares A* expansions per second between the old copied-route search and the current router on a cross-country route
+# run from the project root so the json folder can be found: python scripts/benchrouter.py [threshold] [snapshot]
+
+# Seattle to Boston
+START = [47.606209, -122.332069]
+END = [42.360082, -71.058880]
+
+
+# the original search, which copies and deep copies the whole route for every neighbor it pushes
+def legacyAstar(hw, start, end, threshold):
+    count = 0
+    visited = {}
+    route = {'length_m': 0, 'time_s': 0, 'path': [start]}
+    pq = [(getDistance([start.start.lat, start.start.lon], [end.end.lat, end.end.lon]), 1, route)]
+    while pq and count < threshold:
+        heuristic, _, route = heapq.heappop(pq)
+        lastWayID = route['path'][-1].id
+        count += 1
+        if lastWayID == end.id:
+            return count
+        if lastWayID in visited and visited[lastWayID] <= heuristic:
+            continue
+        visited[lastWayID] = heuristic
+
+        adjacents = hw.tree.getConnected(route['path'][-1]) or []
+        for adjacent in adjacents:
+            if adjacent.id == lastWayID:
+                continue
+            newRoute = route.copy()
+            h = getDistance([end.start.lat, end.start.lon], [adjacent.end.lat, adjacent.end.lon]) + newRoute['length_m'] + adjacent.length
+            if adjacent.id in visited and visited[adjacent.id] <= h:
+                continue
+            newRoute['path'].append(adjacent)
+            newRoute['length_m'] += adjacent.length
+            newRoute['time_s'] += adjacent.time
+            heapq.heappush(pq, (h, len(newRoute['path']), copy.deepcopy(newRoute)))
+    return count
+
+
+def main():
+    threshold = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    # offline and without prefetching, so neither search waits on Overpass and only the searches themselves are timed
+    hw = network.from_snapshot(sys.argv[2], overpass='offline') if len(sys.argv) > 2 else network(overpass='offline')
+    init = hw.tree.getEndWays(START, END)
+
+    with HighwayRouter(hw, None, threshold, prefetch=0) as router:
+        duration = time.time()
+        router.routeAstar(init['start'], init['end'])
+        duration = time.time() - duration
+    print(f'Parent pointer A*: {router.searched} roads in {duration:.3f} s, {router.searched / duration:.0f} roads/s')
+
+    duration = time.time()
+    count = legacyAstar(hw, init['start'], init['end'], threshold)
+    duration = time.time() - duration
+    print(f'Copied route A*: {count} roads in {duration:.3f} s, {count / duration:.0f} roads/s')
+
+
+if __name__ == '__main__':
+    main()
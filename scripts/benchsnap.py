@@ -0,0 +1,50 @@
+#!/opt/homebrew/bin/python3
+
+import os, sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import random
+import time
+from src.hwnetwork import network
+from src import snap
+
+# compares snapping origin/destination pairs one getEndWays call at a time against network.snap_many
+# run from the project root so the json folder can be found: python scripts/benchsnap.py [pairs] [snapshot]
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    hw = network.from_snapshot(sys.argv[2], overpass='offline') if len(sys.argv) > 2 else network(overpass='offline')
+    graph = hw.compile_graph()
+
+    # random pairs of points around the roads we have, inside the bounds of the tree
+    random.seed(0)
+    s, n, w, e = snap.edges(hw.tree.bounds)
+    lats = [min(max(way.start.lat, s), n) for way in graph.ways]
+    lons = [min(max(way.start.lon, w), e) for way in graph.ways]
+    s, n, w, e = min(lats), max(lats), min(lons), max(lons)
+    point = lambda: [random.uniform(s, n), random.uniform(w, e)]
+    origins = [point() for _ in range(count)]
+    destinations = [point() for _ in range(count)]
+
+    duration = time.time()
+    single = []
+    for origin, destination in zip(origins, destinations):
+        ends = hw.tree.getEndWays(origin, destination)
+        single.append((graph.wayIndex[ends['start'].id] if ends['start'] else -1, graph.wayIndex[ends['end'].id] if ends['end'] else -1))
+    duration = time.time() - duration
+    print(f'getEndWays: {count} pairs in {duration:.2f} s, {count / duration:.0f} pairs/s')
+
+    if snap.np is not None:
+        origins, destinations = snap.np.array(origins), snap.np.array(destinations)
+    duration = time.time()
+    starts, ends = hw.snap_many(origins, destinations)
+    duration = time.time() - duration
+    print(f'snap_many ({"NumPy" if snap.np is not None else "no NumPy"}): {count} pairs in {duration:.2f} s, {count / duration:.0f} pairs/s')
+
+    # ties between ways the same distance away go to the lowest way id on both sides, so the answers should be the same ways
+    same = sum(single[i][0] == starts[i] and single[i][1] == ends[i] for i in range(count))
+    print(f'Results match: {same} of {count}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+#!/opt/homebrew/bin/python3
+
+import os, sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import contextlib
+import io
+import random
+import tempfile
+import time
+from src.hwnetwork import network
+from src.highwayRouter import HighwayRouter
+from src import quadtree
+
+# compares loading the network from the json folder against loading its snapshot, and checks that a network loaded from a
+# snapshot, with a road added afterwards the way Overpass adds them, compiles into a second snapshot that routes the same
+# run from the project root so the json folder can be found: python scripts/benchsnapshot.py [routes]
+
+
+# lengths of routes between the same random pairs of points on a network
+def routeLengths(hw, pairs: list) -> list:
+    router = HighwayRouter(hw, None, 10**7, prefetch=0)
+    lengths = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        for start, end in pairs:
+            route = router.route(*start, *end)
+            lengths.append(round(route['length_m'], 6) if route else None)
+    return lengths
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    folder = tempfile.mkdtemp()
+    first, second = os.path.join(folder, 'first.snap'), os.path.join(folder, 'second.snap')
+
+    duration = time.time()
+    hw = network(overpass='offline')
+    print(f'json: {len(hw.tree.index.ways)} roads in {time.time() - duration:.2f} s')
+    hw.compile(first)
+
+    duration = time.time()
+    loaded = network.from_snapshot(first, overpass='offline')
+    print(f'snapshot: {len(loaded.tree.index.ways)} roads in {time.time() - duration:.2f} s')
+
+    # a road from the end of an existing one, added to both networks before the second snapshot is written
+    way = next(iter(hw.tree.index.ways.values()))
+    added = {'id': -1, 'length_mi': 1.0, 'time_s': 60.0, 'tags': {'highway': 'primary'},
+             'startNode': {'id': way.end.id, 'lat': way.end.lat, 'long': way.end.lon},
+             'endNode': {'id': -1, 'lat': way.end.lat + 0.01, 'long': way.end.lon}}
+    hw.tree.add(quadtree.Way(added))
+    loaded.tree.add(quadtree.Way(added))
+    loaded.compile(second)
+    again = network.from_snapshot(second, overpass='offline')
+
+    random.seed(0)
+    ways = list(hw.tree.index.ways.values())
+    pairs = []
+    for _ in range(count):
+        a, b = random.choice(ways), random.choice(ways)
+        pairs.append(([a.start.lat, a.start.lon], [b.end.lat, b.end.lon]))
+
+    expected = routeLengths(hw, pairs)
+    same = sum(x == y for x, y in zip(expected, routeLengths(again, pairs)))
+    print(f'Routes on the re-compiled snapshot match the json network: {same} of {count}')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,18 +1,96 @@
 #!/opt/homebrew/python3
 
 import overpy
+from concurrent.futures import ThreadPoolExecutor
 import json
+import os
+import random
+import sys
 import threading
 import time
 # from tqdm import tqdm
 
-def query(start, end, ways, seen, tile):
-    tile = int(tile)
+# python gethwdata.py [url] [workers] [folder]
+# queries Overpass for all national highways and interstates excluding Alaska and Hawaii, one tile at a time on a small pool of
+# workers. every tile is written to its own compact json file in folder as soon as it finishes and recorded in the folder's
+# manifest.json, so a run that crashes part way through picks up from the tiles it has not finished yet when started again.
+# url can be another Overpass server, like scripts/localoverpass.py, or - for the public one
+
+keepTags = ['highway', 'lanes', 'maxspeed', 'name', 'oneway', 'ref', 'surface']
+
+tilesize = 5.15
+
+startlat = 24.164785
+startlong = -127.826991
+endlat = 49.726580
+endlong = -65.641307
+
+# a failed query waits 5 s, then twice as long each time after that up to 5 minutes, so we back off when Overpass is busy
+backoffStart = 5
+backoffMax = 300
+
+
+# way ids that have already been written by some tile, shared between all workers
+class SeenWays:
+    def __init__(self) -> None:
+        self.ids = set()
+        self.lock = threading.Lock()
+
+    # returns only the ids nobody has claimed yet and claims them
+    def claim(self, ids: list) -> set:
+        with self.lock:
+            new = set(ids) - self.ids
+            self.ids.update(new)
+        return new
+
+
+# the list of finished tiles kept in folder/manifest.json
+class Manifest:
+    def __init__(self, folder: str) -> None:
+        self.path = os.path.join(folder, 'manifest.json')
+        self.lock = threading.Lock()
+        self.tiles = {}
+        if os.path.exists(self.path):
+            with open(self.path, 'r') as file:
+                self.tiles = json.load(file)['tiles']
+
+    def done(self, tile: int) -> bool:
+        return str(tile) in self.tiles
+
+    # records a finished tile, rewriting the manifest in one go so a crash never leaves half of it behind
+    def add(self, tile: int, bbox: list, fileName: str, count: int) -> None:
+        with self.lock:
+            self.tiles[str(tile)] = {'bbox': bbox, 'file': fileName, 'ways': count}
+            tmp = self.path + '.tmp'
+            with open(tmp, 'w') as file:
+                json.dump({'tiles': self.tiles}, file, indent=4)
+            os.replace(tmp, self.path)
+
+
+# every tile over the lower 48 as (tile number, [south, west], [north, east])
+def tiles() -> list:
+    grid = []
+    lastlat = startlat
+    currlat = lastlat
+    while currlat < endlat:
+        currlat = currlat + tilesize if currlat + tilesize < endlat else endlat
+        currlong = startlong
+        lastlong = currlong
+        while currlong < endlong:
+            currlong = currlong + tilesize if currlong + tilesize < endlong else endlong
+            grid.append((len(grid), [lastlat, lastlong], [currlat, currlong]))
+            lastlong = currlong
+        lastlat = currlat
+    return grid
+
+
+def query(start, end, tile, url, seen, manifest, folder):
     duration = time.time()
-    api = overpy.Overpass()
+    api = overpy.Overpass(url=url)
     print(f'\nStarting tile {tile}:')
     print(f'slat ({start[0]:4.2f}) elat ({end[0]:4.2f})')
     print(f'slon ({start[1]:4.2f}) elon ({end[1]:4.2f})')
+    bbox = [start[0], start[1], end[0], end[1]]
     boundbox = f'[bbox:{start[0]},{start[1]},{end[0]},{end[1]}]'
     querybox = """
         [out:json][timeout:600];
@@ -30,30 +108,31 @@ def query(start, end, ways, seen, tile):
         out;
         convert road ::=::,::geom=geom(),'length'=length(),::id=id(),'type'=type();
         """
-    
+
     result = None
+    backoff = backoffStart
     while result == None:
         try:
-            result = api.query(boundbox + querybox)
-        except:
-            time.sleep(5)
-    
-    ways[tile] = {}
+            result = api.query(boundbox + querybox, lean_tags=keepTags)
+        except Exception as e:
+            print(f'\nTile {tile} failed ({type(e).__name__}), retrying in {backoff} s')
+            time.sleep(backoff * random.uniform(0.5, 1.5))
+            backoff = min(backoff * 2, backoffMax)
 
-    # iterate through each length to generate a road dictionary
-    for length in result._lengths.values():
+    ways = {}
 
-        if length.id in seen:
-            continue
+    # iterate through each length that no other tile has written yet to generate a road dictionary
+    new = seen.claim(result.lengths)
+    for wayId, meters in result.lengths.items():
 
-        seen.add(length.id)
+        if wayId not in new:
+            continue
 
-        # get the corresponding way for a particular id and eliminate unnecessary tag elements
-        way = result.get_way(length.id)
-        tags = {tag: val for tag, val in way.tags.items() if tag in keepTags}
+        # the lean result only holds the tags we keep, and the coordinates of the first and last node of each way
+        nodeIds, tags = result.ways[wayId]
 
         # do mileage and time calculations based on the road length and max speed
-        length_miles = float(length.length) * 0.000621371
+        length_miles = meters * 0.000621371
         speed = 45
         if 'maxspeed' in tags:
             try:
@@ -63,78 +142,57 @@ def query(start, end, ways, seen, tile):
         time_seconds = (length_miles / speed) * 3600
 
         # get start and end node for each road and create new dictionaries for the endpoints
-        start = way.nodes[0]
-        end = way.nodes[-1]
-        startNode = {'id': start.id, 'lat': float(start.lat), 'long': float(start.lon)}
-        endNode = {'id': end.id, 'lat': float(end.lat), 'long': float(end.lon)}
+        start = result.nodes[nodeIds[0]]
+        end = result.nodes[nodeIds[-1]]
+        startNode = {'id': nodeIds[0], 'lat': start[0], 'long': start[1]}
+        endNode = {'id': nodeIds[-1], 'lat': end[0], 'long': end[1]}
 
         # create road dictionary and add to ways list
-        wayData = {'id': length.id, 'length_mi': length_miles, 'time_s': time_seconds, 'tags': tags, 'startNode': startNode, 'endNode': endNode}
-        ways[tile][length.id] = wayData
-    
-    print(f'\nTile {tile} finished in {time.time() - duration:.2f} s')
+        wayData = {'id': wayId, 'length_mi': length_miles, 'time_s': time_seconds, 'tags': tags, 'startNode': startNode, 'endNode': endNode}
+        ways[wayId] = wayData
+
+    # the manifest records the box around both ends of every road written rather than the query box, since roads leaving the
+    # tile end outside it and the folder is read as a tile store that finds roads by the bbox of their shard
+    lats = [node['lat'] for way in ways.values() for node in [way['startNode'], way['endNode']]]
+    lons = [node['long'] for way in ways.values() for node in [way['startNode'], way['endNode']]]
+    if ways:
+        bbox = [min(lats), min(lons), max(lats), max(lons)]
+
+    # write the tile straight away without indentation, then record it as finished
+    fileName = f'road_tiles_{tile}.json'
+    tmp = os.path.join(folder, fileName + '.tmp')
+    with open(tmp, 'w') as file:
+        json.dump({tile: ways}, file, separators=(',', ':'))
+    os.replace(tmp, os.path.join(folder, fileName))
+    manifest.add(tile, bbox, fileName, len(ways))
 
+    print(f'\nTile {tile} finished in {time.time() - duration:.2f} s')
 
-# query Overpass API for all national highways and interstates excluding Alaska and Hawaii
-ways = {}
-seen = set()
-keepTags = ['highway', 'lanes', 'maxspeed', 'name', 'oneway', 'ref', 'surface']
 
-tilesize = 5.15
+def main():
+    url = sys.argv[1] if len(sys.argv) > 1 and sys.argv[1] != '-' else None
+    workers = int(sys.argv[2]) if len(sys.argv) > 2 else 2
+    folder = sys.argv[3] if len(sys.argv) > 3 else 'json'
+    os.makedirs(folder, exist_ok=True)
 
-startlat = 24.164785
-startlong = -127.826991
-endlat = 49.726580
-endlong = -65.641307
+    manifest = Manifest(folder)
+    seen = SeenWays()
 
-lastlat = startlat
-lastlong = startlong
-currlat = lastlat
-currlong = lastlong
-numTiles = 61
+    # ways written by tiles finished in an earlier run must not be written again
+    for entry in manifest.tiles.values():
+        with open(os.path.join(folder, entry['file']), 'r') as file:
+            for tile in json.load(file).values():
+                seen.claim([int(wayId) for wayId in tile])
 
-threads = []
+    todo = [t for t in tiles() if not manifest.done(t[0])]
+    print(f'{len(manifest.tiles)} tiles already finished, {len(todo)} to go')
 
-while currlat < endlat:
-    currlat = currlat + tilesize if currlat + tilesize < endlat else endlat
-    currlong = startlong
-    lastlong = currlong
-    while currlong < endlong:
-        currlong = currlong + tilesize if currlong + tilesize < endlong else endlong
-        
-        thread = threading.Thread(target=query, args=([lastlat, lastlong], [currlat, currlong], ways, seen, numTiles))
-        thread.start()
-        threads.append((numTiles, thread))
+    # the pool keeps at most workers queries in flight, Overpass only gives each client a couple of slots anyway
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(query, start, end, tile, url, seen, manifest, folder) for tile, start, end in todo]
+        for future in futures:
+            future.result()
 
-        time.sleep(0.5)
 
-        numTiles += 1
-        lastlong = currlong
-    
-    lastlat = currlat
-    
-
-fileNum = 13
-tiles = []
-for t, thread in enumerate(threads):
-    thread[1].join()
-    tiles.append(thread[0])
-
-    # dump all transformed road structures into massive json file for future use
-    # no excessive querying here
-    if t > 0 and t % 5 == 0:
-        print(f'\nWriting file: road_tiles_{fileNum}.json')
-        temp = {k: v for k, v in ways.items() if k in tiles}
-        ways_json = json.dumps(temp, indent=4)
-        with open(f'road_tiles_{fileNum}.json', 'w') as file:
-            file.write(ways_json)
-        for tile in tiles:
-            del ways[tile]
-        tiles = []
-        fileNum += 1
-
-print(f'\nWriting file: road_tiles_{fileNum}.json')
-temp = {k: v for k, v in ways.items() if k in tiles}
-ways_json = json.dumps(temp, indent=4)
-with open(f'road_tiles_{fileNum}.json', 'w') as file:
-    file.write(ways_json)
\ No newline at end of file
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,149 @@
+#!/opt/homebrew/bin/python3
+
+import os, sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Thread
+import json
+import re
+import time
+import xml.etree.ElementTree
+from src import tilestore
+from src.quadtree import getDistance
+
+# a stand-in for the Overpass API that answers road queries from road dictionaries we already have
+# it speaks just enough of the protocol for our own queries: a node(id:...) query (QuadTree.fetchNeighborRoadsBatch) gets back
+# the length, way and node elements for every road touching those nodes, and a [bbox:...] query (gethwdata.py) gets every road
+# with an end inside the box, so ingest and on demand lookups can be load tested without the internet
+class LocalOverpass:
+    # ways is a dictionary of road dictionaries keyed by way id, latency is how long every request should take in seconds
+    def __init__(self, ways: dict, port: int = 0, latency: float = 0) -> None:
+        self.ways = ways
+        self.latency = latency
+        self.requests = 0
+
+        # every road a node is part of, so a lookup never has to scan the whole network
+        self.byNode = {}
+        for way in ways.values():
+            for node in [way['startNode'], way['endNode']]:
+                self.byNode.setdefault(node['id'], []).append(way)
+
+        server = self
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                query = self.rfile.read(int(self.headers.get('Content-Length', 0))).decode('utf-8')
+                server.requests += 1
+                time.sleep(server.latency)
+                body = json.dumps(server.answer(query)).encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', port), Handler)
+        self.url = f'http://127.0.0.1:{self.httpd.server_address[1]}/api/interpreter'
+        self.thread = None
+
+    # loads every road from a folder of json tiles, laid out the same way as the json folder network reads
+    # the ingest manifest is skipped and tiles may be gzip compressed, just like when network loads the folder
+    @classmethod
+    def fromTiles(cls, folder: str, port: int = 0, latency: float = 0) -> 'LocalOverpass':
+        ways = {}
+        for filename in os.listdir(folder):
+            if tilestore.isTile(filename):
+                for way in tilestore.iterWays(os.path.join(folder, filename)):
+                    ways[way['id']] = way
+        return cls(ways, port, latency)
+
+    # loads every road from an OpenStreetMap xml extract, splitting nothing so each OSM way becomes one road like gethwdata makes
+    # highways lists the highway tags worth keeping, since a full extract is mostly residential streets
+    @classmethod
+    def fromOsm(cls, path: str, port: int = 0, latency: float = 0, highways: list = ['motorway', 'motorway_link', 'trunk', 'primary']) -> 'LocalOverpass':
+        keepTags = ['highway', 'lanes', 'maxspeed', 'name', 'oneway', 'ref', 'surface']
+        nodes = {}
+        ways = {}
+        for _, element in xml.etree.ElementTree.iterparse(path):
+            if element.tag == 'node':
+                nodes[int(element.get('id'))] = (float(element.get('lat')), float(element.get('lon')))
+            elif element.tag == 'way':
+                tags = {tag.get('k'): tag.get('v') for tag in element.iter('tag')}
+                refs = [int(nd.get('ref')) for nd in element.iter('nd') if int(nd.get('ref')) in nodes]
+                if tags.get('highway') in highways and len(refs) > 1:
+                    tags = {tag: val for tag, val in tags.items() if tag in keepTags}
+
+                    # the same length and time calculations as the Overpass ingest
+                    length_miles = sum(getDistance(nodes[a], nodes[b]) for a, b in zip(refs, refs[1:]))
+                    speed = 45
+                    if 'maxspeed' in tags:
+                        try:
+                            speed = int(tags['maxspeed'].split(' ')[0])
+                        except:
+                            speed = 45
+                    start = {'id': refs[0], 'lat': nodes[refs[0]][0], 'long': nodes[refs[0]][1]}
+                    end = {'id': refs[-1], 'lat': nodes[refs[-1]][0], 'long': nodes[refs[-1]][1]}
+                    ways[int(element.get('id'))] = {'id': int(element.get('id')), 'length_mi': length_miles, 'time_s': (length_miles / speed) * 3600,
+                                                    'tags': tags, 'startNode': start, 'endNode': end}
+            if element.tag in ['node', 'way', 'relation']:
+                element.clear()
+        return cls(ways, port, latency)
+
+    # builds the Overpass json response for a query
+    def answer(self, query: str) -> dict:
+        match = re.search(r'node\(id:([\d,\s]+)\)', query)
+        nodeIds = [int(n) for n in match.group(1).split(',') if n.strip()] if match else []
+
+        ways = {}
+        for nodeId in nodeIds:
+            for way in self.byNode.get(nodeId, []):
+                ways[way['id']] = way
+
+        box = re.search(r'\[bbox:([-\d.]+),([-\d.]+),([-\d.]+),([-\d.]+)\]', query)
+        if box:
+            s, w, n, e = [float(v) for v in box.groups()]
+            for way in self.ways.values():
+                if any(s <= node['lat'] <= n and w <= node['long'] <= e for node in [way['startNode'], way['endNode']]):
+                    ways[way['id']] = way
+
+        # lengths first, then the ways and every node they reference, which is the order our query prints them in
+        elements = []
+        nodes = {}
+        for way in ways.values():
+            elements.append({'type': 'length', 'id': way['id'], 'tags': {'length': str(way['length_mi'] / 0.000621371)}})
+        for way in ways.values():
+            elements.append({'type': 'way', 'id': way['id'], 'nodes': [way['startNode']['id'], way['endNode']['id']], 'tags': way['tags']})
+            for node in [way['startNode'], way['endNode']]:
+                nodes[node['id']] = node
+        for node in nodes.values():
+            elements.append({'type': 'node', 'id': node['id'], 'lat': node['lat'], 'lon': node['long']})
+        return {'version': 0.6, 'generator': 'TriRoutes local Overpass', 'elements': elements}
+
+    # serves requests on a background thread and returns the url to point overpy at
+    def start(self) -> str:
+        self.thread = Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self.url
+
+    def stop(self) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def main():
+    # python scripts/localoverpass.py [json folder or .osm extract] [port] [latency] serves the roads until interrupted
+    source = sys.argv[1] if len(sys.argv) > 1 else 'json'
+    port = int(sys.argv[2]) if len(sys.argv) > 2 else 8080
+    latency = float(sys.argv[3]) if len(sys.argv) > 3 else 0
+    server = LocalOverpass.fromOsm(source, port, latency) if source.endswith('.osm') else LocalOverpass.fromTiles(source, port, latency)
+    print(f'Serving {len(server.ways)} roads at {server.url}')
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        server.httpd.server_close()
+
+
+if __name__ == '__main__':
+    main()
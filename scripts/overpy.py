@@ -24,6 +24,7 @@
 
 from collections import OrderedDict
 from datetime import datetime
+import codecs
 from decimal import Decimal
 from urllib.request import urlopen
 from urllib.error import HTTPError
@@ -130,11 +131,12 @@ class Overpass:
             raise exception.OverpassRuntimeRemark(msg=msg)
         raise exception.OverpassUnknownError(msg=msg)
 
-    def query(self, query: Union[bytes, str]) -> "Result":
+    def query(self, query: Union[bytes, str], lean_tags: Optional[List[str]] = None) -> Union["Result", "LeanResult"]:
         """
         Query the Overpass API
 
         :param query: The query string in Overpass QL
+        :param lean_tags: Parse a JSON response into a LeanResult keeping only these tags (TriRoutes addition)
         :return: The parsed result
         """
         if not isinstance(query, bytes):
@@ -152,12 +154,24 @@ class Overpass:
             except HTTPError as e:
                 f = e
 
-            response = f.read(self.read_chunk_size)
+            ####### TriRoutes code
+            # successful json responses are parsed element by element as they arrive instead of being buffered whole first
+            if f.code == 200 and f.getheader("Content-Type") == "application/json":
+                try:
+                    if lean_tags is not None:
+                        return self.parse_json_lean(f, lean_tags)
+                    return self.parse_json_stream(f)
+                finally:
+                    f.close()
+
+            chunks = []
             while True:
                 data = f.read(self.read_chunk_size)
                 if len(data) == 0:
                     break
-                response = response + data
+                chunks.append(data)
+            response = b"".join(chunks)
+            #######
             f.close()
 
             current_exception: exception.OverPyException
@@ -167,7 +181,7 @@ class Overpass:
                 if content_type == "application/json":
                     return self.parse_json(response)
 
-                if content_type == "application/osm3s+xml":
+                if content_type == "application/osm3s+xml" and lean_tags is None:
                     return self.parse_xml(response)
 
                 current_exception = exception.OverpassUnknownContentType(content_type)
@@ -234,6 +248,118 @@ class Overpass:
         return Result.from_json(data_parsed, api=self)
 
 
+    ####### TriRoutes code
+    def parse_json_stream(self, f, encoding: str = "utf-8") -> "Result":
+        """
+        Parse a JSON response from Overpass while it is still being read, one element at a time.
+
+        :param f: File like object with the raw response
+        :param encoding: Encoding of the response
+        :return: Result object
+        """
+        result = Result(api=self)
+        for element in self._iter_json_elements(f, encoding):
+            result.append_json(element)
+        return result
+
+    def parse_json_lean(self, f, tags: List[str], encoding: str = "utf-8") -> "LeanResult":
+        """
+        Parse a JSON response from Overpass straight into compact records, skipping Decimal coordinates and element objects.
+        Only the way lengths, way node ids, the requested way tags and the coordinates of nodes that start or end a way are kept,
+        so nodes have to follow the ways that use them in the response, which is how `.w out; node(w.w); out;` prints them.
+
+        :param f: File like object with the raw response
+        :param tags: Way tags to keep
+        :param encoding: Encoding of the response
+        :return: LeanResult object
+        """
+        result = LeanResult()
+        keep = set(tags)
+        ends = set()
+        for element in self._iter_json_elements(f, encoding, parse_float=float):
+            e_type = element.get("type")
+            if e_type == "length":
+                result.lengths[element["id"]] = float(element["tags"]["length"])
+            elif e_type == "way":
+                node_ids = element.get("nodes", [])
+                if node_ids:
+                    ends.add(node_ids[0])
+                    ends.add(node_ids[-1])
+                result.ways[element["id"]] = (node_ids, {k: v for k, v in element.get("tags", {}).items() if k in keep})
+            elif e_type == "node" and element["id"] in ends:
+                result.nodes[element["id"]] = (float(element["lat"]), float(element["lon"]))
+        return result
+
+    def _iter_json_elements(self, f, encoding: str = "utf-8", parse_float: Callable = Decimal):
+        """
+        Yield each entry of the elements array of a JSON response as soon as it has been read completely.
+        Only the element currently being read is buffered, so memory does not grow with the size of the response.
+
+        :param f: File like object with the raw response
+        :param encoding: Encoding of the response
+        :raises overpy.exception.OverpassRuntimeError: If the response ends with a runtime error remark
+        """
+        decoder = json.JSONDecoder(parse_float=parse_float)
+        text = codecs.getincrementaldecoder(encoding)()
+        start = re.compile(r'"elements"\s*:\s*\[')
+        skip = re.compile(r'[\s,]*')
+        buf = ""
+        pos = 0
+        in_elements = False
+        done = False
+        eof = False
+        while True:
+            if not in_elements and not done:
+                m = start.search(buf)
+                if m:
+                    in_elements = True
+                    buf = buf[m.end():]
+                    pos = 0
+
+            if in_elements:
+                while True:
+                    pos = skip.match(buf, pos).end()
+                    if pos >= len(buf):
+                        break
+                    if buf[pos] == "]":
+                        in_elements = False
+                        done = True
+                        pos += 1
+                        break
+                    try:
+                        element, pos = decoder.raw_decode(buf, pos)
+                    except json.JSONDecodeError:
+                        # the element continues in the next chunk
+                        if eof:
+                            raise
+                        break
+                    yield element
+                buf = buf[pos:]
+                pos = 0
+
+            if eof:
+                break
+            data = f.read(self.read_chunk_size)
+            if len(data) == 0:
+                eof = True
+                buf += text.decode(b"", final=True)
+            else:
+                buf += text.decode(data)
+
+        if in_elements:
+            raise json.JSONDecodeError("Unterminated elements array", buf, pos)
+
+        # whatever follows the elements (or the whole response if there were none) is small, and may hold a remark
+        rest = buf.strip()
+        if done:
+            rest = rest.lstrip(",").strip()
+            rest = "{" + rest if rest and rest != "}" else ""
+        if rest:
+            data_parsed = json.loads(rest, parse_float=Decimal)
+            if "remark" in data_parsed:
+                self._handle_remark_msg(msg=data_parsed.get("remark"))
+    #######
+
     def parse_xml(self, data: Union[bytes, str], encoding: str = "utf-8", parser: Optional[int] = None):
         """
 
@@ -256,6 +382,24 @@ class Overpass:
 
 
 
+####### TriRoutes code
+class LeanResult:
+    """
+    Compact result produced by Overpass.parse_json_lean.
+
+    :ivar lengths: Length in meters of each way, keyed by way id
+    :ivar ways: Tuple of (node ids, kept tags) for each way, keyed by way id
+    :ivar nodes: Tuple of (lat, lon) floats for every node starting or ending a way, keyed by node id
+    """
+    __slots__ = ("lengths", "ways", "nodes")
+
+    def __init__(self):
+        self.lengths: Dict[int, float] = {}
+        self.ways: Dict[int, Tuple[List[int], Dict[str, str]]] = {}
+        self.nodes: Dict[int, Tuple[float, float]] = {}
+#######
+
+
 class Result:
     """
     Class to handle the result.
@@ -332,6 +476,22 @@ class Result:
                 self._class_collection_map[element.__class__].setdefault(element.id, element)
 
 
+    ####### TriRoutes code
+    def append_json(self, data: dict):
+        """
+        Create an element from its JSON data and append it to the result.
+
+        :param data: Element data from JSON
+        """
+        e_type = data.get("type")
+        if not hasattr(e_type, "lower"):
+            return
+        for elem_cls in [Node, Way, Relation, Area, Length]:
+            if e_type.lower() == elem_cls._type_value:
+                self.append(elem_cls.from_json(data, result=self))
+                return
+    #######
+
     def get_elements(
                 self,
                 filter_cls: Type[ElementTypeVar],
@@ -0,0 +1,117 @@
+#!/opt/homebrew/bin/python3
+
+import os, sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from math import floor
+import json
+import sqlite3
+import time
+from src import tilestore
+
+# python scripts/reshard.py source_folder out_folder [target MB] [gzip]
+# dedupes the roads in every tile file of source_folder and writes them back out as spatial shards of about target MB of json
+# each, with a manifest the network can load lazily (see src/tilestore.py). roads are streamed through an sqlite file on disk
+# instead of a python set, so memory stays flat however big the dataset is. replaces removedups.py and compress.py
+
+# roads are grouped by 1 degree cells walked in Morton (Z) order, so consecutive roads, and therefore each shard, stay close together
+CELL = 1.0
+
+# how many roads are inserted into the index per transaction
+BATCH = 10000
+
+
+# interleaves the bits of a cell's row and column so nearby cells get nearby keys
+def morton(lat: float, lon: float) -> int:
+    row = floor((lat + 90) / CELL)
+    col = floor((lon + 180) / CELL)
+    key = 0
+    for bit in range(16):
+        key |= ((row >> bit) & 1) << (2 * bit + 1) | ((col >> bit) & 1) << (2 * bit)
+    return key
+
+
+# streams every road into the index, where the primary key drops duplicates, and returns (roads read, roads kept)
+def index(db: sqlite3.Connection, source: str) -> tuple:
+    read = 0
+    batch = []
+
+    def flush():
+        db.executemany('INSERT OR IGNORE INTO ways VALUES (?, ?, ?, ?, ?, ?, ?)', batch)
+        db.commit()
+        batch.clear()
+
+    for fileName in sorted(os.listdir(source)):
+        if not tilestore.isTile(fileName):
+            continue
+        for way in tilestore.iterWays(os.path.join(source, fileName)):
+            start, end = way['startNode'], way['endNode']
+            batch.append((way['id'], morton(start['lat'], start['long']),
+                          min(start['lat'], end['lat']), min(start['long'], end['long']), max(start['lat'], end['lat']), max(start['long'], end['long']),
+                          json.dumps(way, separators=(',', ':'))))
+            read += 1
+            if len(batch) >= BATCH:
+                flush()
+    flush()
+    return read, db.execute('SELECT COUNT(*) FROM ways').fetchone()[0]
+
+
+# writes the roads out in cell order, starting a new shard whenever the current one reaches target bytes
+def write(db: sqlite3.Connection, folder: str, target: int, compress: bool) -> dict:
+    manifest = {}
+    shard = None
+
+    def close():
+        shard['file'].write('}}')
+        shard['file'].close()
+        manifest[shard['key']] = {'bbox': shard['bbox'], 'file': shard['name'], 'ways': shard['ways']}
+
+    db.execute('CREATE INDEX IF NOT EXISTS ways_cell ON ways (cell, id)')
+    for wayId, s, w, n, e, data in db.execute('SELECT id, s, w, n, e, data FROM ways ORDER BY cell, id'):
+        if shard is None or shard['bytes'] >= target:
+            if shard:
+                close()
+            key = str(len(manifest))
+            name = f'shard_{key}.json' + ('.gz' if compress else '')
+            shard = {'key': key, 'name': name, 'file': tilestore.openTile(os.path.join(folder, name), 'w'), 'bbox': [s, w, n, e], 'ways': 0, 'bytes': 0}
+            shard['file'].write(f'{{"{key}":{{')
+
+        entry = f'{"," if shard["ways"] else ""}"{wayId}":{data}'
+        shard['file'].write(entry)
+        shard['bytes'] += len(entry)
+        shard['ways'] += 1
+        bbox = shard['bbox']
+        shard['bbox'] = [min(bbox[0], s), min(bbox[1], w), max(bbox[2], n), max(bbox[3], e)]
+    if shard:
+        close()
+
+    with open(os.path.join(folder, tilestore.MANIFEST), 'w') as file:
+        json.dump({'tiles': manifest}, file, indent=4)
+    return manifest
+
+
+def main():
+    source = sys.argv[1]
+    folder = sys.argv[2]
+    target = int(float(sys.argv[3]) * 1e6) if len(sys.argv) > 3 else 8000000
+    compress = len(sys.argv) > 4 and sys.argv[4] == 'gzip'
+    os.makedirs(folder, exist_ok=True)
+
+    duration = time.time()
+    path = os.path.join(folder, '.reshard.db')
+    if os.path.exists(path):
+        os.remove(path)
+    db = sqlite3.connect(path)
+    db.execute('PRAGMA journal_mode=OFF')
+    db.execute('PRAGMA synchronous=OFF')
+    db.execute('CREATE TABLE ways (id INTEGER PRIMARY KEY, cell INTEGER, s REAL, w REAL, n REAL, e REAL, data TEXT)')
+
+    read, kept = index(db, source)
+    print(f'{read} roads read, {read - kept} duplicates dropped')
+    manifest = write(db, folder, target, compress)
+    db.close()
+    os.remove(path)
+    print(f'{kept} roads written to {len(manifest)} shards in {time.time() - duration:.2f} s')
+
+
+if __name__ == '__main__':
+    main()
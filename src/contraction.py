@@ -0,0 +1,211 @@
+#!/opt/homebrew/bin/python3
+
+import os, sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from array import array
+import heapq
+import struct
+from src.graph import Graph
+
+# contraction hierarchies over the compiled highway graph
+# nodes are contracted one at a time from least to most important, adding shortcut arcs wherever the only shortest path
+# between two neighbors ran through the contracted node. queries then only ever move up the hierarchy from both ends,
+# so a coast to coast route settles a few hundred nodes instead of flooding the whole network
+HIERARCHY_MAGIC = b'TRCH'
+HIERARCHY_VERSION = 1
+
+HEADER = struct.Struct('<4sIQQQ16s')
+
+# how far a witness search may look before we give up and add the shortcut anyway
+WITNESS_SETTLE_LIMIT = 500
+
+
+class Hierarchy:
+    # builds the hierarchy for one of the graph's edge weight columns ('length' or 'time')
+    def __init__(self, graph: Graph, metric: str = 'length', build: bool = True) -> None:
+        self.graph = graph
+        self.metric = metric
+        if build:
+            self._build(getattr(graph, metric))
+
+    def _build(self, weights: array) -> None:
+        graph = self.graph
+        n = len(graph)
+
+        # every arc is (from, to, weight, original edge, left child arc, right child arc), shortcuts have no original edge
+        self.arcFrom = array('i')
+        self.arcTo = array('i')
+        self.arcWeight = array('d')
+        self.arcEdge = array('i')
+        self.arcLeft = array('i')
+        self.arcRight = array('i')
+
+        # working adjacency between nodes that are not contracted yet, keeping only the cheapest arc between two nodes
+        out = [{} for _ in range(n)]
+        inn = [{} for _ in range(n)]
+
+        def addArc(u, v, w, edge, left, right):
+            if u == v or (v in out[u] and out[u][v][0] <= w):
+                return
+            arc = len(self.arcFrom)
+            self.arcFrom.append(u)
+            self.arcTo.append(v)
+            self.arcWeight.append(w)
+            self.arcEdge.append(edge)
+            self.arcLeft.append(left)
+            self.arcRight.append(right)
+            out[u][v] = (w, arc)
+            inn[v][u] = (w, arc)
+
+        for u in range(n):
+            for e in range(graph.offsets[u], graph.offsets[u + 1]):
+                addArc(u, graph.targets[e], weights[e], e, -1, -1)
+
+        # shortest distance from x to each target avoiding the node being contracted, bounded by maxCost
+        def witness(x, skip, targets, maxCost):
+            dist = {x: 0}
+            pq = [(0, x)]
+            settled = 0
+            remaining = set(targets)
+            while pq and remaining and settled < WITNESS_SETTLE_LIMIT:
+                d, v = heapq.heappop(pq)
+                if d > dist[v]:
+                    continue
+                if d > maxCost:
+                    break
+                settled += 1
+                remaining.discard(v)
+                for y, (w, _) in out[v].items():
+                    if y == skip:
+                        continue
+                    if y not in dist or d + w < dist[y]:
+                        dist[y] = d + w
+                        heapq.heappush(pq, (d + w, y))
+            return dist
+
+        # returns the shortcuts contracting u would need as (x, y, weight, arc x->u, arc u->y)
+        def shortcuts(u):
+            needed = []
+            for x, (a, arcIn) in inn[u].items():
+                targets = {y: (b, arcOut) for y, (b, arcOut) in out[u].items() if y != x}
+                if not targets:
+                    continue
+                dist = witness(x, u, targets, a + max(b for b, _ in targets.values()))
+                for y, (b, arcOut) in targets.items():
+                    if y not in dist or dist[y] > a + b:
+                        needed.append((x, y, a + b, arcIn, arcOut))
+            return needed
+
+        # importance is the edge difference plus how many neighbors are already contracted, which spreads contraction out evenly
+        contracted = [False] * n
+        deleted = [0] * n
+
+        def importance(u):
+            return len(shortcuts(u)) - len(inn[u]) - len(out[u]) + deleted[u]
+
+        pq = [(importance(u), u) for u in range(n)]
+        heapq.heapify(pq)
+
+        self.rank = array('i', [0]) * n
+        upOut = [None] * n
+        upIn = [None] * n
+        level = 0
+        while pq:
+            _, u = heapq.heappop(pq)
+            if contracted[u]:
+                continue
+
+            # lazy update, only contract u if it is still the least important node
+            priority = importance(u)
+            if pq and priority > pq[0][0]:
+                heapq.heappush(pq, (priority, u))
+                continue
+
+            # every arc still touching u goes to a more important node, so it belongs to u's upward graphs
+            upOut[u] = [arc for _, arc in out[u].values()]
+            upIn[u] = [arc for _, arc in inn[u].values()]
+
+            for x, y, w, left, right in shortcuts(u):
+                addArc(x, y, w, -1, left, right)
+
+            contracted[u] = True
+            self.rank[u] = level
+            level += 1
+            for x in inn[u]:
+                del out[x][u]
+                deleted[x] += 1
+            for y in out[u]:
+                del inn[y][u]
+                deleted[y] += 1
+            out[u] = {}
+            inn[u] = {}
+
+        self.upOffsets, self.upArcs = self._pack(upOut)
+        self.downOffsets, self.downArcs = self._pack(upIn)
+
+    # turns per node arc lists into compressed sparse row arrays
+    def _pack(self, lists: list) -> tuple:
+        offsets = array('q', [0])
+        arcs = array('i')
+        for arcList in lists:
+            arcs.extend(arcList)
+            offsets.append(len(arcs))
+        return offsets, arcs
+
+    # expands an arc into the original graph edges it stands for, in driving order
+    def unpack(self, arc: int) -> list:
+        edges = []
+        stack = [arc]
+        while stack:
+            a = stack.pop()
+            if self.arcEdge[a] != -1:
+                edges.append(self.arcEdge[a])
+            else:
+                stack.append(self.arcRight[a])
+                stack.append(self.arcLeft[a])
+        return edges
+
+    def save(self, path: str) -> None:
+        columns = [self.rank, self.upOffsets, self.upArcs, self.downOffsets, self.downArcs,
+                   self.arcFrom, self.arcTo, self.arcWeight, self.arcEdge, self.arcLeft, self.arcRight]
+        header = HEADER.pack(HIERARCHY_MAGIC, HIERARCHY_VERSION, len(self.graph), len(self.graph.targets), len(self.arcFrom), self.metric.encode('utf-8'))
+        tmp = path + '.tmp'
+        with open(tmp, 'wb') as file:
+            file.write(header)
+            for column in columns:
+                column.tofile(file)
+        os.replace(tmp, path)
+
+    # loads a hierarchy saved for the same compiled graph
+    @classmethod
+    def load(cls, path: str, graph: Graph) -> 'Hierarchy':
+        with open(path, 'rb') as file:
+            magic, version, nodes, edges, arcs, metric = HEADER.unpack(file.read(HEADER.size))
+            if magic != HIERARCHY_MAGIC:
+                raise ValueError('File is not a TriRoutes contraction hierarchy')
+            if version != HIERARCHY_VERSION:
+                raise ValueError(f'Hierarchy version {version} does not match expected version {HIERARCHY_VERSION}, rebuild it')
+            if nodes != len(graph) or edges != len(graph.targets):
+                raise ValueError('Hierarchy was built for a different network, rebuild it')
+
+            ch = cls(graph, metric.rstrip(b'\0').decode('utf-8'), build=False)
+            sizes = [('rank', 'i', nodes), ('upOffsets', 'q', nodes + 1), ('upArcs', 'i', None), ('downOffsets', 'q', nodes + 1), ('downArcs', 'i', None),
+                     ('arcFrom', 'i', arcs), ('arcTo', 'i', arcs), ('arcWeight', 'd', arcs), ('arcEdge', 'i', arcs), ('arcLeft', 'i', arcs), ('arcRight', 'i', arcs)]
+            for name, code, size in sizes:
+                column = array(code)
+                # the arc lists are as long as the last entry of the offsets that precede them
+                column.fromfile(file, size if size is not None else getattr(ch, name.replace('Arcs', 'Offsets'))[-1])
+                setattr(ch, name, column)
+        return ch
+
+
+def main():
+    from src.hwnetwork import network
+
+    # python src/contraction.py out.ch [snapshot] [metric] builds and saves a hierarchy next to the network data
+    hw = network.from_snapshot(sys.argv[2]) if len(sys.argv) > 2 else network()
+    hw.compile_hierarchy(sys.argv[3] if len(sys.argv) > 3 else 'length', sys.argv[1])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+#!/opt/homebrew/bin/python3
+
+import os, sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from array import array
+from src import quadtree
+
+
+# array backed highway graph in compressed sparse row form, compiled from the ways held in a node index
+# nodes and ways are renumbered densely (sorted by OSM id so the numbering is stable between runs) and the
+# directed edges leaving node u are offsets[u] to offsets[u + 1] in the edge arrays, and the edges arriving at node u
+# are listed in inEdges from inOffsets[u] to inOffsets[u + 1]
+class Graph:
+    def __init__(self, index: quadtree.NodeIndex) -> None:
+        # dense way numbering, edges refer back to these so routes can still be returned as Way objects
+        self.ways = [index.ways[i] for i in sorted(index.ways)]
+        self.wayIndex = {way.id: i for i, way in enumerate(self.ways)}
+
+        # dense node numbering and coordinates
+        nodes = {}
+        for way in self.ways:
+            nodes[way.start.id] = way.start
+            nodes[way.end.id] = way.end
+        self.nodeIds = array('q', sorted(nodes))
+        self.nodeIndex = {n: i for i, n in enumerate(self.nodeIds)}
+        self.lat = array('d', [nodes[n].lat for n in self.nodeIds])
+        self.lon = array('d', [nodes[n].lon for n in self.nodeIds])
+
+        # every way is an edge from start to end, two way roads also get an edge from end to start
+        edges = []
+        for w, way in enumerate(self.ways):
+            u = self.nodeIndex[way.start.id]
+            v = self.nodeIndex[way.end.id]
+            edges.append((u, v, w, 1))
+            if not way.oneway and u != v:
+                edges.append((v, u, w, 0))
+        edges.sort()
+
+        self.offsets = array('q', [0]) * (len(self.nodeIds) + 1)
+        for u, _, _, _ in edges:
+            self.offsets[u + 1] += 1
+        for u in range(len(self.nodeIds)):
+            self.offsets[u + 1] += self.offsets[u]
+
+        self.sources = array('i', [e[0] for e in edges])
+        self.targets = array('i', [e[1] for e in edges])
+        self.edgeWay = array('i', [e[2] for e in edges])
+        self.edgeForward = array('b', [e[3] for e in edges])
+        self.length = array('d', [self.ways[e[2]].length for e in edges])
+        self.time = array('d', [self.ways[e[2]].time for e in edges])
+
+        # fastest speed anywhere in the network in mph, which turns distance bounds into travel time bounds
+        self.maxSpeed = max([l / t * 3600 for l, t in zip(self.length, self.time) if t > 0], default=1)
+
+        # the same edges grouped by the node they arrive at, for searches that run backwards from a destination
+        order = sorted(range(len(edges)), key=lambda e: edges[e][1])
+        self.inEdges = array('i', order)
+        self.inOffsets = array('q', [0]) * (len(self.nodeIds) + 1)
+        for e in order:
+            self.inOffsets[edges[e][1] + 1] += 1
+        for u in range(len(self.nodeIds)):
+            self.inOffsets[u + 1] += self.inOffsets[u]
+
+    def __len__(self) -> int:
+        return len(self.nodeIds)
+
+    # returns the directed Way for an edge, using the shared reverse view when the edge runs backwards
+    def edgeToWay(self, e: int) -> quadtree.Way:
+        way = self.ways[self.edgeWay[e]]
+        return way if self.edgeForward[e] else way.reverse()
@@ -2,26 +2,120 @@
 
 from src.hwnetwork import network
 from src.quadtree import getDistance
+from src.prefetch import NeighborPrefetcher
 import heapq
-import copy
+from math import inf
 
 # this class serves as the main form of routing over the highway network we create in hwnetwork.py
 class HighwayRouter():
 
+    # highest speed limit posted anywhere in the country in mph, which bounds the speed of any road the 'ways' engine may load
+    # from shards or Overpass after the router is built
+    MAX_SPEED = 85
+
+    # assumed speed in mph on the local roads between the true start or end coordinates and a candidate way, for the time metric
+    ACCESS_SPEED = 30
+
+    # label key of the virtual goal reached by finishing on any of the end ways
+    GOAL = (-1, True)
+
     # setup the router with a highway network and a mapper
-    def __init__(self, hw, mapper, threshold):
+    # engine picks the search: 'ways' walks Way objects and can pull missing roads from Overpass,
+    # 'graph' runs over the compiled array graph of the network and 'ch' queries its contraction hierarchy without a threshold
+    # 'bidirectional' grows searches over the compiled graph from both ends at once
+    # heuristic is used by the 'graph' and 'bidirectional' engines: 'haversine' or 'alt' for the landmark triangle inequality bound
+    # metric is what routes are optimized for, 'distance' in miles or 'time' in seconds
+    # prefetch is how many Overpass lookups the 'ways' engine may run in the background at once, 0 looks roads up only when stuck
+    # candidates is how many of the nearest ways around each end the 'ways' and 'graph' engines may start and finish on,
+    # each costed with its distance from the true coordinates, instead of committing to the single nearest one of each
+    # hierarchy and landmarks are paths to files saved by compile_hierarchy and compile_landmarks, loaded when the network has
+    # none yet instead of building them here, which takes a long time on the full network
+    def __init__(self, hw, mapper, threshold, engine='ways', heuristic='haversine', metric='distance', prefetch=4, candidates=1,
+                 hierarchy=None, landmarks=None):
         self.threshold = threshold
+        self.candidates = candidates
         self.hw = hw
         self.mapper = mapper
+        self.engine = engine
+        self.heuristicMode = heuristic
+        self.metric = metric
+
+        # the Way attribute and graph column holding the cost of each road for this metric
+        self.column = 'time' if metric == 'time' else 'length'
+
+        # only the A* searches over the compiled graph use landmarks, so building them for any other engine is wasted work
+        if heuristic == 'alt' and engine not in ['graph', 'bidirectional']:
+            raise ValueError(f"The 'alt' heuristic is only used by the 'graph' and 'bidirectional' engines, not '{engine}'")
+
+        # a lazily loaded network has no roads until a route asks for them, so there is nothing to compile a graph from
+        if hw.store is not None and engine != 'ways':
+            raise ValueError(f"The '{engine}' engine searches a graph compiled ahead of time, a network loading shards lazily only works with the 'ways' engine")
+
+        if engine in ['graph', 'bidirectional'] and hw.graph is None:
+            hw.compile_graph()
+        if engine == 'ch' and hw.hierarchy is None:
+            if hierarchy:
+                hw.load_hierarchy(hierarchy)
+            else:
+                hw.compile_hierarchy(self.column)
+        if heuristic == 'alt' and hw.landmarks is None:
+            if landmarks:
+                hw.load_landmarks(landmarks)
+            else:
+                hw.compile_landmarks(metric=self.column)
+        if engine == 'ch' and hw.hierarchy.metric != self.column:
+            raise ValueError(f'Contraction hierarchy was built for {hw.hierarchy.metric}, not {self.column}')
+        if heuristic == 'alt' and hw.landmarks.metric != self.column:
+            raise ValueError(f'Landmarks were built for {hw.landmarks.metric}, not {self.column}')
+
+        # Haversine miles are turned into a travel time lower bound using the fastest road there can be
+        # the compiled graph never changes, so the engines searching it can use its own fastest road as a tighter bound
+        self.scale = 1
+        if metric == 'time':
+            self.scale = 3600 / (self.MAX_SPEED if engine == 'ways' else hw.graph.maxSpeed)
+
+        # number of roads expanded by the most recent search
+        self.searched = 0
+
+        # background Overpass lookups for roads that lead off the edge of the network we have
+        self.prefetcher = NeighborPrefetcher(hw.tree, prefetch) if engine == 'ways' and prefetch > 0 else None
+
+    # stops the background lookups for good once we are done routing, the router can also be used in a with block to do this
+    def close(self):
+        if self.prefetcher:
+            self.prefetcher.close()
+            self.prefetcher = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
     
     # main call to get a route between a pair of start and end coordinates
     def route(self, slat, slon, elat, elon):
 
+        # when the network loads lazily, pull in the shards between the two points first
+        self.hw.loadCorridor([slat, slon], [elat, elon])
+
         # get the start and end ways for this particular routing
         init = self.hw.tree.getEndWays([slat, slon], [elat, elon])
 
+        # with several candidates the searches get lists of (access cost, way) and pick the best pair themselves
+        if self.candidates > 1 and self.engine in ['ways', 'graph']:
+            init = self.getCandidates([slat, slon], [elat, elon])
+            if not init['start'] or not init['end']:
+                return None
+
         # get the route from the actual A* algorithm
-        route = self.routeAstar(init['start'], init['end'])
+        if self.engine == 'graph':
+            route = self.routeGraph(init['start'], init['end'])
+        elif self.engine == 'bidirectional':
+            route = self.routeBidirectional(init['start'], init['end'])
+        elif self.engine == 'ch':
+            route = self.routeHierarchy(init['start'], init['end'])
+        else:
+            route = self.routeAstar(init['start'], init['end'])
         if not route:
             return None
         
@@ -31,123 +125,456 @@ class HighwayRouter():
         return route
     
 
-    # takes a pair of start and end ways, and the desired destination coordinates
-    def routeAstar(self, start, end):
+    # the candidate start and end ways near two pairs of coordinates as lists of (access cost, way), nearest first
+    def getCandidates(self, start, end):
+        tree = self.hw.tree
+        starts = tree.nearestWays(start, self.candidates, 'start', tree.heading(start, end, 'start'))
+        ends = tree.nearestWays(end, self.candidates, 'end', tree.heading(start, end, 'end'))
+        return {'start': [(self.accessCost(d), way) for d, way in starts], 'end': [(self.accessCost(d), way) for d, way in ends]}
+
+
+    # cost of getting between the true coordinates and a way that many miles away, in the units of the metric
+    def accessCost(self, miles):
+        return miles / self.ACCESS_SPEED * 3600 if self.metric == 'time' else miles
+
+
+    # takes a pair of start and end ways and searches for the best path between them
+    # either can also be a list of (access cost, way) candidates, then the search starts from every start way at once, each
+    # already carrying its access cost, and finishes at a virtual goal reached from any end way plus its access cost
+    # onExpand is an optional callback that receives the route so far and its adjacent ways at every step
+    def routeAstar(self, start, end, onExpand=None):
+        starts = start if isinstance(start, list) else [(0, start)]
+        ends = end if isinstance(end, list) else [(0, end)]
+        exits = self.exits(ends)
 
         count = 0
 
-        # visited dictionary keeps track of the best heuristic it takes to reach each way that has been visited
-        visited = {}
+        # labels keep the best known search state for each directed way: (cost, length, time, parent key, directed way)
+        # they are keyed by (way id, forward), since both directions of a two way road share its id but are reached separately
+        # paths are only rebuilt from the parent pointers once we reach the destination
+        labels = {}
 
-        # start off with a route only containing the starting way and add it to our priority queue
-        route = {'length_m': 0, 'time_s': 0, 'path': [start]}
-        pq = [(getDistance([start.start.lat, start.start.lon], [end.end.lat, end.end.lon]), 1, route)]
+        # priority queue entries are (heuristic, cost, key), stale entries are skipped when popped
+        pq = []
+        for access, way in starts:
+            key = (way.id, way.forward)
+            if key in labels and labels[key][0] <= access:
+                continue
+            labels[key] = (access, 0, 0, None, way)
+            h = min(getDistance([way.start.lat, way.start.lon], [e.end.lat, e.end.lon]) * self.scale + a for a, e in ends)
+            heapq.heappush(pq, (access + h, access, key))
+            self.reachGoal(labels, pq, exits, key, access)
+        last = (starts[0][1].id, starts[0][1].forward)
 
         # main loop of A*, keep popping from the priority queue until we reach the destination way or run out of paths
         while pq and count < self.threshold:
 
-            # pop the best route available from the priority queue
-            heuristic, _, route = heapq.heappop(pq)
-            lastWayID = route['path'][-1].id
-            count += 1
+            # pop the best way available from the priority queue
+            heuristic, g, last = heapq.heappop(pq)
 
-            # check if the end of the path is our destination
-            if lastWayID == end.id:
-                print(f'Roads searched: {count}')
-                return route
-            
-            # check if we have been to this way in a more optimal fashion before
-            if lastWayID in visited and visited[lastWayID] <= heuristic:
+            # check if we have been to this way in a more optimal fashion since this entry was pushed
+            if g > labels[last][0]:
                 continue
+            count += 1
+
+            # check if we have finished on one of the end ways
+            if last == self.GOAL:
+                last = labels[self.GOAL][3]
+                break
 
-            # otherwise update the visited dictionary
-            visited[lastWayID] = heuristic
+            # add any roads the background lookups have finished fetching since the last step
+            if self.prefetcher:
+                self.prefetcher.collect()
 
-            # iterate over all connecting highways to our current end way
-            adjacents = self.hw.tree.getConnected(route['path'][-1])
+            # iterate over all connecting highways to our current end way, loading the shards around it first if the search
+            # has wandered outside the ones we have
+            _, length, time, _, way = labels[last]
+            self.hw.loadAt(way.end)
+            adjacents = self.hw.tree.getConnected(way)
 
-            # for some reason adjacents can end up being none?
-            validTypes = ['motorway', 'primary', 'motorway_link']
-            if not adjacents and 'highway' in route['path'][-1].tags and route['path'][-1].tags['highway'] in validTypes:
-            # if not adjacents:
-                # print(route['path'][-1].tags['highway'])
-                self.hw.tree.queryNeighborRoads(route['path'][-1].end)
-                adjacents = self.hw.tree.getConnected(route['path'][-1])
-            
-            if not adjacents:
-                adjacents = []
+            # if the only way out is turning around, we need the roads Overpass knows about, waiting on the lookup if it is still running
+            if self.isDangling(way, adjacents):
+                if self.prefetcher:
+                    self.prefetcher.resolve(way.end)
+                else:
+                    self.hw.tree.queryNeighborRoads(way.end)
+                adjacents = self.hw.tree.getConnected(way)
+
+            if onExpand:
+                onExpand(self.buildRoute(labels, last), [a for a in adjacents if a.id != way.id])
 
             for adjacent in adjacents:
-                newRoute = route.copy()
+                # never turn around onto the road we are already on
+                if adjacent.id == way.id:
+                    continue
 
-                # calculate heuristic for the new path
-                h = self.heuristic(newRoute, adjacent, end)
+                newG = g + getattr(adjacent, self.column)
 
-                # if we have visited this way more optimally, skip it
-                if adjacent.id in visited and visited[adjacent.id] <= h:
+                # if we have reached this way in this direction more optimally, skip it
+                key = (adjacent.id, adjacent.forward)
+                if key in labels and labels[key][0] <= newG:
                     continue
 
-                # update the route to include the new road and length/time measures
-                newRoute['path'].append(adjacent)
-                newRoute['length_m'] += adjacent.length
-                newRoute['time_s'] += adjacent.time
-                # print((h, len(newRoute['path']), newRoute))
-                heapq.heappush(pq, (h, len(newRoute['path']), copy.deepcopy(newRoute)))
-        
+                # otherwise record the new best label and push the way with its heuristic
+                labels[key] = (newG, length + adjacent.length, time + adjacent.time, last, adjacent)
+                heapq.heappush(pq, (self.heuristic(g, adjacent, ends), newG, key))
+                self.reachGoal(labels, pq, exits, key, newG)
+
+                # start fetching what lies past a dangling road now, so it is ready if the search ever pops it
+                if self.prefetcher and self.isDangling(adjacent, self.hw.tree.getConnected(adjacent)):
+                    self.prefetcher.schedule(adjacent.end)
+
+        # lookups still running for roads the search never reached are of no use anymore
+        if self.prefetcher:
+            self.prefetcher.cancel()
+
+        self.searched = count
         print(f'Roads searched: {count}')
-        return route
+        return self.buildRoute(labels, last)
+
+
+    # the smallest access cost of finishing on each end way by id
+    def exits(self, ends):
+        exits = {}
+        for access, way in ends:
+            exits[way.id] = min(access, exits.get(way.id, inf))
+        return exits
+
+
+    # a way we just reached that is one of the end ways can finish the route, so the goal gets a label through it when that
+    # beats the best finish so far. reaching the goal does not stop the search driving on, another end way may be cheaper
+    # either direction of an end way finishes the route
+    def reachGoal(self, labels, pq, exits, key, g):
+        if key[0] not in exits:
+            return
+        cost = g + exits[key[0]]
+        if self.GOAL in labels and labels[self.GOAL][0] <= cost:
+            return
+        labels[self.GOAL] = (cost, 0, 0, key, None)
+        heapq.heappush(pq, (cost, cost, self.GOAL))
+
+
+    # a major road whose only way out is turning around probably continues somewhere we have not loaded yet
+    def isDangling(self, way, adjacents):
+        validTypes = ['motorway', 'primary', 'motorway_link']
+        deadEnd = all(a.id == way.id for a in adjacents)
+        return deadEnd and 'highway' in way.tags and way.tags['highway'] in validTypes
+
+
+    # follows parent pointers back from a label key to rebuild the full route dictionary
+    def buildRoute(self, labels, key):
+        _, length, time, _, _ = labels[key]
+        path = []
+        while key is not None:
+            _, _, _, key, way = labels[key]
+            path.append(way)
+        path.reverse()
+        return {'length_m': length, 'time_s': time, 'path': path}
     
 
+    # A* over the compiled graph, starting from the end of the start way and finishing once the end way has been driven
+    # nodes are integer indices and each edge is a couple of array reads, so no Way objects are touched until the path is built
+    # start and end can also be lists of (access cost, way) candidates, just like routeAstar
+    def routeGraph(self, start, end):
+        starts = start if isinstance(start, list) else [(0, start)]
+        ends = end if isinstance(end, list) else [(0, end)]
+
+        graph = self.hw.graph
+        offsets, targets, edgeWay = graph.offsets, graph.targets, graph.edgeWay
+        weights = getattr(graph, self.column)
+
+        # access cost of finishing on each end way by its graph index, and the heuristic towards each of them
+        exits = {graph.wayIndex[wayID]: access for wayID, access in self.exits(ends).items()}
+        estimates = [(access, self.graphHeuristic(way)) for access, way in ends]
+
+        def h(v):
+            return min(access + estimate(v) for access, estimate in estimates)
+
+        # best cost and the edge used to reach each node we have seen, the goal is the virtual node -1
+        # every start way seeds the node at its end, and origin remembers which start way a parentless node came from
+        dist = {}
+        parent = {}
+        origin = {}
+        for access, way in starts:
+            source = graph.nodeIndex[way.end.id]
+            cost = access + exits.get(graph.wayIndex[way.id], inf)
+            if cost < dist.get(-1, inf):
+                dist[-1], parent[-1], origin[-1] = cost, -1, way
+            if access < dist.get(source, inf):
+                dist[source], parent[source], origin[source] = access, -1, way
+        pq = [(g if v == -1 else g + h(v), g, v) for v, g in dist.items()]
+        heapq.heapify(pq)
+        count = 0
+        u = graph.nodeIndex[starts[0][1].end.id]
+
+        while pq and count < self.threshold:
+            _, g, u = heapq.heappop(pq)
+            if g > dist[u]:
+                continue
+            count += 1
+
+            if u == -1:
+                break
+
+            for e in range(offsets[u], offsets[u + 1]):
+                newG = g + weights[e]
+
+                # driving any edge of an end way can finish the route
+                if edgeWay[e] in exits and newG + exits[edgeWay[e]] < dist.get(-1, inf):
+                    dist[-1] = newG + exits[edgeWay[e]]
+                    parent[-1] = e
+                    heapq.heappush(pq, (dist[-1], dist[-1], -1))
+
+                v = targets[e]
+                if v in dist and dist[v] <= newG:
+                    continue
+                dist[v] = newG
+                parent[v] = e
+                heapq.heappush(pq, (newG + h(v), newG, v))
+
+        self.searched = count
+        print(f'Roads searched: {count}')
+
+        edges = self.graphEdges(parent, u)
+        return self.buildGraphRoute(origin[graph.sources[edges[0]] if edges else u], edges)
+
+
+    # walks parent edges back from node u (or the virtual goal -1) to the search source, returning the edges in driving order
+    def graphEdges(self, parent, u):
+        graph = self.hw.graph
+        edges = []
+        e = parent[u]
+        while e != -1:
+            edges.append(e)
+            e = parent[graph.sources[e]]
+        edges.reverse()
+        return edges
+
+
+    # turns a list of graph edges driven after the start way into a route dictionary
+    def buildGraphRoute(self, start, edges):
+        path = [start] + [self.hw.graph.edgeToWay(e) for e in edges]
+        return {'length_m': sum(way.length for way in path[1:]), 'time_s': sum(way.time for way in path[1:]), 'path': path}
+
+
+    # bidirectional A* over the compiled graph, forward from the end of the start way and backward over reversed edges from the end way
+    # both sides use the average of the forward and backward estimates as their potential so their keys can be compared directly,
+    # and the search stops once the smallest keys on both sides add up to the best route found so far
+    def routeBidirectional(self, start, end):
+        if start.id == end.id:
+            return {'length_m': 0, 'time_s': 0, 'path': [start]}
+
+        graph = self.hw.graph
+        weights, endWay = getattr(graph, self.column), graph.wayIndex[end.id]
+        source = graph.nodeIndex[start.end.id]
+        toEnd = self.graphHeuristic(end)
+        fromStart = self.graphHeuristic(start, reverse=True)
+
+        def potential(v):
+            return (toEnd(v) - fromStart(v)) / 2
+
+        fdist = {source: 0}
+        fparent = {source: -1}
+        fpq = [(potential(source), 0, source)]
+
+        # the backward side starts from the tail of every edge of the end way, with parents -2 - e marking that edge
+        bdist = {}
+        bparent = {}
+        for node in [end.start, end.end]:
+            u = graph.nodeIndex[node.id]
+            for e in range(graph.offsets[u], graph.offsets[u + 1]):
+                if graph.edgeWay[e] == endWay and (u not in bdist or weights[e] < bdist[u]):
+                    bdist[u] = weights[e]
+                    bparent[u] = -2 - e
+        bpq = [(d - potential(u), d, u) for u, d in bdist.items()]
+        heapq.heapify(bpq)
+
+        best = bdist[source] if source in bdist else inf
+        meet = source if source in bdist else -1
+        count = 0
+        u = source
+
+        while fpq and bpq and count < self.threshold and fpq[0][0] + bpq[0][0] < best:
+            forward = fpq[0][0] <= bpq[0][0]
+            if forward:
+                pq, dist, parent, other = fpq, fdist, fparent, bdist
+                offsets, edges, ends, sign = graph.offsets, None, graph.targets, 1
+            else:
+                pq, dist, parent, other = bpq, bdist, bparent, fdist
+                offsets, edges, ends, sign = graph.inOffsets, graph.inEdges, graph.sources, -1
+
+            _, g, v = heapq.heappop(pq)
+            if g > dist[v]:
+                continue
+            count += 1
+            if forward:
+                u = v
+
+            for i in range(offsets[v], offsets[v + 1]):
+                e = i if forward else edges[i]
+                w = ends[e]
+                newG = g + weights[e]
+                if w in dist and dist[w] <= newG:
+                    continue
+                dist[w] = newG
+                parent[w] = e
+                heapq.heappush(pq, (newG + sign * potential(w), newG, w))
+
+                # every node labelled by both sides is a candidate meeting point
+                if w in other and newG + other[w] < best:
+                    best = newG + other[w]
+                    meet = w
+
+        self.searched = count
+        print(f'Roads searched: {count}')
+
+        # without a meeting point we return how far the forward side got, just like the single direction search
+        if meet == -1:
+            return self.buildGraphRoute(start, self.graphEdges(fparent, u))
+
+        edges = self.graphEdges(fparent, meet)
+        e = bparent[meet]
+        while e >= 0:
+            edges.append(e)
+            e = bparent[graph.targets[e]]
+        edges.append(-2 - e)
+        return self.buildGraphRoute(start, edges)
+
+
+    # returns the remaining cost estimate for graph nodes on the way to the end way
+    # the end way can be driven in either direction, so the estimate is to whichever of its ends is closer
+    # with reverse set, the way passed in is the start way and the estimate is of the cost from the end of it to each node
+    def graphHeuristic(self, way, reverse=False):
+        graph = self.hw.graph
+        lat, lon = graph.lat, graph.lon
+        ends = [way.end] if reverse else [way.start, way.end]
+        goals = [[node.lat, node.lon] for node in ends]
+
+        scale = self.scale
+
+        def haversine(v):
+            return min(getDistance([lat[v], lon[v]], goal) for goal in goals) * scale
+
+        if self.heuristicMode != 'alt':
+            return haversine
+
+        # the landmark bound is usually much tighter, but Haversine can still win next to the goal so take the larger of the two
+        landmarks = self.hw.landmarks
+        targets = [graph.nodeIndex[node.id] for node in ends]
+
+        def alt(v):
+            if reverse:
+                return max(haversine(v), landmarks.bound(targets[0], v))
+            return max(haversine(v), min(landmarks.bound(v, t) for t in targets))
+
+        return alt
+
+
+    # bidirectional search over the contraction hierarchy, both sides only ever move to more important nodes
+    # the backward side starts from both ends of the end way so the end way is driven in whichever direction is best
+    def routeHierarchy(self, start, end):
+        if start.id == end.id:
+            return {'length_m': 0, 'time_s': 0, 'path': [start]}
+
+        graph = self.hw.graph
+        ch = self.hw.hierarchy
+        weights = getattr(graph, ch.metric)
+        endWay = graph.wayIndex[end.id]
+
+        source = graph.nodeIndex[start.end.id]
+        fdist = {source: 0}
+        fparent = {source: -1}
+        fpq = [(0, source)]
+
+        # parents on the backward side are arcs, except for the seeds which store -2 - e for the end way edge e
+        bdist = {}
+        bparent = {}
+        for node in [end.start, end.end]:
+            u = graph.nodeIndex[node.id]
+            for e in range(graph.offsets[u], graph.offsets[u + 1]):
+                if graph.edgeWay[e] == endWay and (u not in bdist or weights[e] < bdist[u]):
+                    bdist[u] = weights[e]
+                    bparent[u] = -2 - e
+        bpq = [(d, u) for u, d in bdist.items()]
+        heapq.heapify(bpq)
+
+        best = inf
+        meet = -1
+        count = 0
+
+        # always advance the side with the smaller key, and stop once neither side can beat the best meeting point
+        while (fpq and fpq[0][0] < best) or (bpq and bpq[0][0] < best):
+            forward = bool(fpq) and (not bpq or fpq[0][0] <= bpq[0][0])
+            pq, dist, parent, other = (fpq, fdist, fparent, bdist) if forward else (bpq, bdist, bparent, fdist)
+            offsets, arcs, ends = (ch.upOffsets, ch.upArcs, ch.arcTo) if forward else (ch.downOffsets, ch.downArcs, ch.arcFrom)
+
+            d, u = heapq.heappop(pq)
+            if d > dist[u]:
+                continue
+            count += 1
+
+            if u in other and d + other[u] < best:
+                best = d + other[u]
+                meet = u
+
+            for i in range(offsets[u], offsets[u + 1]):
+                a = arcs[i]
+                v = ends[a]
+                newD = d + ch.arcWeight[a]
+                if v not in dist or newD < dist[v]:
+                    dist[v] = newD
+                    parent[v] = a
+                    heapq.heappush(pq, (newD, v))
+
+        self.searched = count
+        print(f'Nodes settled: {count}')
+        if meet == -1:
+            return None
+
+        # unpack the forward arcs from the start up to the meeting node, then the backward arcs down to the end way
+        arcs = []
+        u = meet
+        while fparent[u] != -1:
+            arcs.append(fparent[u])
+            u = ch.arcFrom[fparent[u]]
+        edges = [e for a in reversed(arcs) for e in ch.unpack(a)]
+
+        u = meet
+        while bparent[u] >= 0:
+            edges.extend(ch.unpack(bparent[u]))
+            u = ch.arcTo[bparent[u]]
+        edges.append(-2 - bparent[u])
+
+        path = [start] + [graph.edgeToWay(e) for e in edges]
+        return {'length_m': sum(way.length for way in path[1:]), 'time_s': sum(way.time for way in path[1:]), 'path': path}
+
+
     # returns a series of maps for a given A* search to make it easier to visualize the algorithm
     def routeMaps(self, slat, slon, elat, elon):
+        self.hw.loadCorridor([slat, slon], [elat, elon])
         init = self.hw.tree.getEndWays([slat, slon], [elat, elon])
         maps = self.AstarMaps(init['start'], init['end'])
         return maps
 
 
-    # this works the exact same as the normal algorithm, just saving a map for each step of the algorithm
+    # this runs the exact same algorithm as the normal route, just saving a map for each step of the algorithm
     def AstarMaps(self, start, end):
-        count = 0
         maps = []
-        visited = {}
-        route = {'length_m': 0, 'time_s': 0, 'path': [start]}
-        pq = [(getDistance([start.start.lat, start.start.lon], [end.end.lat, end.end.lon]), 1, route)]
-        while pq and count < self.threshold:
-            heuristic, _, route = heapq.heappop(pq)
-            lastWayID = route['path'][-1].id
-            count += 1
-            if lastWayID == end.id:
-                return maps
-            if lastWayID in visited and visited[lastWayID] <= heuristic:
-                continue
-
-            visited[lastWayID] = heuristic
-
-            # add map for current step to maps array
-            adjacents = self.hw.tree.getConnected(route['path'][-1])
-            maps.append(self.mapper.mapAstarStep(route, adjacents))
-
-            for adjacent in adjacents:
-                newRoute = route.copy()
-                h = self.heuristic(newRoute, adjacent, end)
-                if adjacent.id in visited and visited[adjacent.id] <= h:
-                    continue
-                newRoute['path'].append(adjacent)
-                newRoute['length_m'] += adjacent.length
-                newRoute['time_s'] += adjacent.time
-                heapq.heappush(pq, (h, len(newRoute['path']), copy.deepcopy(newRoute)))
-            
+        self.routeAstar(start, end, lambda route, adjacents: maps.append(self.mapper.mapAstarStep(route, adjacents)))
         return maps
 
     
-    # this returns the distance traveled so far plus the Haversine distance remaining to the destination
-    def heuristic(self, route, way, end):
-        # distance traveled so far
-        lastNode = way.end
-        h = getDistance([end.start.lat, end.start.lon], [lastNode.lat, lastNode.lon])
+    # this returns the cost so far plus the Haversine distance remaining to the destination (as a time at top speed for the time metric)
+    # with a list of (access cost, way) end candidates, the remaining estimate is to whichever finish looks cheapest
+    def heuristic(self, g, way, end):
+        ends = end if isinstance(end, list) else [(0, end)]
 
         # Haversine distance remaining, which is an underestimation
-        g = route['length_m'] + way.length
+        lastNode = way.end
+        h = min(getDistance([e.start.lat, e.start.lon], [lastNode.lat, lastNode.lon]) * self.scale + access for access, e in ends)
+
+        # cost traveled so far
+        g = g + getattr(way, self.column)
         return g + h
 
 
@@ -178,8 +605,8 @@ class HighwayRouter():
 
 def main():
     hw = network()
-    router = HighwayRouter(hw, None)
-    print(router.route(42.293894, -84.275253, 42.271693, -84.847918))
+    with HighwayRouter(hw, None, 5000) as router:
+        print(router.route(42.293894, -84.275253, 42.271693, -84.847918))
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
@@ -3,16 +3,48 @@
 import os, sys
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 import json
+from concurrent.futures import ProcessPoolExecutor
 from src import quadtree
+from src import snapshot
+from src.graph import Graph
+from src.contraction import Hierarchy
+from src.landmarks import Landmarks
+from src.neighborcache import NeighborCache
+from src import tilestore
+from src.tilestore import TileStore
+from src.snap import Snapper
 
 # this class contains the entire highway network and appropriate functions
 class network():
 
-    # get all ways from the json folder of this project
-    def __init__(self):
-        # sys.setrecursionlimit(1000000)
+    # get all ways from the json folder of this project, or use an already built tree (see from_snapshot)
+    # cache is an optional path to a sqlite file remembering Overpass neighbor lookups between runs
+    # overpass is the url of the Overpass server to ask for missing roads, or 'offline' to never leave the loaded network and cache
+    # shards is a tile store folder (see tilestore.py) to load lazily from, in which case nothing is loaded until a route asks for it
+    # workers above 1 parses the json tiles in that many processes at once
+    def __init__(self, tree=None, cache=None, overpass=None, shards=None, workers=1):
+        # array backed graph used by the faster routing engines, built by compile_graph
+        self.graph = None
+        self.hierarchy = None
+        self.landmarks = None
+        self.snapper = None
+
+        # the tile store and the keys of the shards already in the tree when loading lazily
+        self.store = None
+        self.loaded = set()
+
+        if tree:
+            self.tree = tree
+            self.connect(cache, overpass)
+            return
+
         bounds = quadtree.BoundingBox([24.164785, -127.826991], [49.726580, -65.641307])
-        self.tree = quadtree.QuadTree(bounds)
+        self.tree = quadtree.QuadTree(bounds, quadtree.NodeIndex())
+
+        if shards:
+            self.store = TileStore(shards)
+            self.connect(cache, overpass)
+            return
 
         # for fileName in os.listdir('../json/'):
         #     with open(f'../json/{fileName}', 'r') as file:
@@ -20,19 +52,136 @@ class network():
         #         for way in temp:
         #             print(way)
 
-        for fileName in os.listdir('json/'):
-            with open(f'json/{fileName}', 'r') as file:
-                temp = json.load(file)
-                for val in temp.values():
-                    for i, way in enumerate(val.values()):
-                        # if i > 5:
-                        #     break
-                        self.tree.add(quadtree.Way(way))
+        # skip the ingest manifest and any tile gethwdata.py was still writing, tiles may also be gzip compressed
+        files = [f'json/{fileName}' for fileName in os.listdir('json/') if tilestore.isTile(fileName)]
+        if workers > 1:
+            ways = self.loadParallel(files, workers)
+        else:
+            ways = [quadtree.Way(way) for path in files for way in tilestore.iterWays(path)]
+
+        # every road is known up front, so the tree is bulk built in one go rather than grown a road at a time
+        self.tree = quadtree.QuadTree.build(bounds, ways, quadtree.NodeIndex())
+        self.connect(cache, overpass)
+
+    # parses tile files in a process pool and returns their roads, in the same order as the sequential load
+    # workers hand back compact tuples rather than dictionaries, and nodes and tag sets are shared between the roads that use them
+    def loadParallel(self, files, workers):
+        nodes = {}
+        tags = {}
+        ways = []
+
+        def node(nodeId, lat, lon):
+            if nodeId not in nodes:
+                nodes[nodeId] = quadtree.Node({'id': nodeId, 'lat': lat, 'long': lon})
+            return nodes[nodeId]
+
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for tagKeys, records in pool.map(tilestore.readCompact, files):
+                tagList = [tags[key] if key in tags else tags.setdefault(key, json.loads(key)) for key in tagKeys]
+                for wayId, length, time, t, sId, sLat, sLon, eId, eLat, eLon in records:
+                    ways.append(quadtree.Way.fromParts(wayId, length, time, tagList[t], node(sId, sLat, sLon), node(eId, eLat, eLon)))
+        return ways
+
+    # sets where the tree gets roads it is missing from, see __init__
+    def connect(self, cache=None, overpass=None):
+        self.tree.cache = NeighborCache(cache) if cache else None
+        self.tree.offline = overpass == 'offline'
+        self.tree.overpassUrl = None if self.tree.offline else overpass
+
+    # adds every shard in keys that is not in the tree yet, returning how many were loaded
+    def loadShards(self, keys):
+        keys = [key for key in keys if key not in self.loaded]
+        for key in keys:
+            for way in self.store.load(key):
+                self.tree.add(quadtree.Way(way))
+            self.loaded.add(key)
+        return len(keys)
+
+    # loads the shards along the straight line from start to end, widened by margin degrees on every side
+    # we step along the line so a diagonal cross country route only pulls in a band of shards instead of its whole bounding box
+    def loadCorridor(self, start, end, margin=1.0):
+        if not self.store:
+            return 0
+        steps = max(1, int(max(abs(end[0] - start[0]), abs(end[1] - start[1])) / margin))
+        keys = set()
+        for i in range(steps + 1):
+            lat = start[0] + (end[0] - start[0]) * i / steps
+            lon = start[1] + (end[1] - start[1]) * i / steps
+            keys.update(self.store.intersecting(lat - margin, lon - margin, lat + margin, lon + margin))
+        return self.loadShards(keys)
+
+    # makes sure every shard around a node is loaded, which the router calls as its frontier moves
+    def loadAt(self, node):
+        if not self.store:
+            return 0
+        return self.loadShards(self.store.at(node.lat, node.lon))
+
+    # write the fully built network to a binary snapshot file so later startups can skip parsing the json tiles
+    def compile(self, path):
+        snapshot.write(self.tree, path)
+
+    # renumber the network densely and build the compressed sparse row graph used by the array based router
+    # the graph is a static copy, so roads added later by Overpass queries need another compile_graph call
+    def compile_graph(self):
+        self.graph = Graph(self.tree.index)
+        return self.graph
+
+    # contract the compiled graph into a hierarchy for the 'ch' router, saving it to path when given
+    # this is an offline step and can take a long time on the full network
+    def compile_hierarchy(self, metric='length', path=None):
+        if self.graph is None:
+            self.compile_graph()
+        self.hierarchy = Hierarchy(self.graph, metric)
+        if path:
+            self.hierarchy.save(path)
+        return self.hierarchy
+
+    # load a hierarchy saved by compile_hierarchy for this same network
+    def load_hierarchy(self, path):
+        if self.graph is None:
+            self.compile_graph()
+        self.hierarchy = Hierarchy.load(path, self.graph)
+        return self.hierarchy
+
+    # pick landmarks and compute their distance tables for the ALT heuristic, saving them to path when given
+    def compile_landmarks(self, count=16, metric='length', path=None):
+        if self.graph is None:
+            self.compile_graph()
+        self.landmarks = Landmarks(self.graph, count, metric)
+        if path:
+            self.landmarks.save(path)
+        return self.landmarks
+
+    # load landmark tables saved by compile_landmarks for this same network
+    def load_landmarks(self, path):
+        if self.graph is None:
+            self.compile_graph()
+        self.landmarks = Landmarks.load(path, self.graph)
+        return self.landmarks
+
+    # snaps many origin/destination pairs at once (see snap.py), vectorized with NumPy when it is installed
+    # returns the graph.ways index of the start way for every origin and of the end way for every destination, -1 where none fits
+    def snap_many(self, origins, destinations):
+        if self.graph is None:
+            self.compile_graph()
+        if self.snapper is None or self.snapper.graph is not self.graph:
+            self.snapper = Snapper(self.tree, self.graph)
+        return self.snapper.snap(origins, destinations)
+
+    # load a network from a snapshot written by compile, which is much faster than rebuilding from json
+    @classmethod
+    def from_snapshot(cls, path, cache=None, overpass=None):
+        return cls(snapshot.read(path), cache, overpass)
 
 
 def main():
     hw = network()
-    print(str(hw.tree))
+
+    # passing a path compiles the network into a snapshot there, otherwise just print the tree
+    if len(sys.argv) > 1:
+        hw.compile(sys.argv[1])
+    else:
+        print(str(hw.tree))
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
@@ -0,0 +1,125 @@
+#!/opt/homebrew/bin/python3
+
+import os, sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from array import array
+from math import inf
+import heapq
+import struct
+from src.graph import Graph
+
+# landmark distance tables for the ALT (A*, landmarks, triangle inequality) heuristic
+# for every landmark L we store d(L, v) and d(v, L) for all nodes v, and the triangle inequality then gives
+# d(v, t) >= d(L, t) - d(L, v) and d(v, t) >= d(v, L) - d(t, L), which is far tighter than Haversine on a sparse highway graph
+LANDMARKS_MAGIC = b'TRLM'
+LANDMARKS_VERSION = 1
+
+HEADER = struct.Struct('<4sIQQI16s')
+
+
+# shortest distances from source to every node, or from every node to source when reverse is set
+def dijkstra(graph: Graph, source: int, weights: array, reverse: bool = False) -> array:
+    dist = array('d', [inf]) * len(graph)
+    dist[source] = 0
+    offsets, edges, ends = (graph.inOffsets, graph.inEdges, graph.sources) if reverse else (graph.offsets, None, graph.targets)
+    pq = [(0, source)]
+    while pq:
+        d, u = heapq.heappop(pq)
+        if d > dist[u]:
+            continue
+        for i in range(offsets[u], offsets[u + 1]):
+            e = edges[i] if reverse else i
+            v = ends[e]
+            newD = d + weights[e]
+            if newD < dist[v]:
+                dist[v] = newD
+                heapq.heappush(pq, (newD, v))
+    return dist
+
+
+class Landmarks:
+    # picks count landmarks for one of the graph's edge weight columns ('length' or 'time') and computes their tables
+    def __init__(self, graph: Graph, count: int = 16, metric: str = 'length', build: bool = True) -> None:
+        self.graph = graph
+        self.metric = metric
+        self.nodes = array('i')
+        self.fromLandmark = []
+        self.toLandmark = []
+        if build:
+            self._build(count, getattr(graph, metric))
+
+    # farthest selection: each new landmark is the reachable node farthest from all landmarks chosen so far,
+    # which spreads them around the edges of the network where they give the best bounds
+    def _build(self, count: int, weights: array) -> None:
+        graph = self.graph
+        n = len(graph)
+        if n == 0:
+            return
+
+        closest = dijkstra(graph, 0, weights)
+        for i in range(count):
+            candidates = [(d, v) for v, d in enumerate(closest) if d < inf]
+            if not candidates or max(candidates)[0] == 0:
+                break
+            landmark = max(candidates)[1]
+            self.nodes.append(landmark)
+            self.fromLandmark.append(dijkstra(graph, landmark, weights))
+            self.toLandmark.append(dijkstra(graph, landmark, weights, reverse=True))
+
+            # distance to the nearest landmark, which is zero at the landmarks themselves so they are never picked twice
+            fromL = self.fromLandmark[-1]
+            closest = fromL if i == 0 else array('d', map(min, closest, fromL))
+
+    # lower bound on the distance from node v to node t
+    def bound(self, v: int, t: int) -> float:
+        best = 0
+        for fromL, toL in zip(self.fromLandmark, self.toLandmark):
+            if fromL[v] < inf and fromL[t] < inf and fromL[t] - fromL[v] > best:
+                best = fromL[t] - fromL[v]
+            if toL[v] < inf and toL[t] < inf and toL[v] - toL[t] > best:
+                best = toL[v] - toL[t]
+        return best
+
+    def save(self, path: str) -> None:
+        header = HEADER.pack(LANDMARKS_MAGIC, LANDMARKS_VERSION, len(self.graph), len(self.graph.targets), len(self.nodes), self.metric.encode('utf-8'))
+        tmp = path + '.tmp'
+        with open(tmp, 'wb') as file:
+            file.write(header)
+            self.nodes.tofile(file)
+            for fromL, toL in zip(self.fromLandmark, self.toLandmark):
+                fromL.tofile(file)
+                toL.tofile(file)
+        os.replace(tmp, path)
+
+    # loads landmark tables saved for the same compiled graph
+    @classmethod
+    def load(cls, path: str, graph: Graph) -> 'Landmarks':
+        with open(path, 'rb') as file:
+            magic, version, nodes, edges, count, metric = HEADER.unpack(file.read(HEADER.size))
+            if magic != LANDMARKS_MAGIC:
+                raise ValueError('File is not a TriRoutes landmark table')
+            if version != LANDMARKS_VERSION:
+                raise ValueError(f'Landmark version {version} does not match expected version {LANDMARKS_VERSION}, rebuild them')
+            if nodes != len(graph) or edges != len(graph.targets):
+                raise ValueError('Landmarks were built for a different network, rebuild them')
+
+            landmarks = cls(graph, count, metric.rstrip(b'\0').decode('utf-8'), build=False)
+            landmarks.nodes.fromfile(file, count)
+            for _ in range(count):
+                for table in [landmarks.fromLandmark, landmarks.toLandmark]:
+                    column = array('d')
+                    column.fromfile(file, nodes)
+                    table.append(column)
+        return landmarks
+
+
+def main():
+    from src.hwnetwork import network
+
+    # python src/landmarks.py out.alt [snapshot] [metric] [count] builds and saves landmark tables next to the network data
+    hw = network.from_snapshot(sys.argv[2]) if len(sys.argv) > 2 else network()
+    hw.compile_landmarks(int(sys.argv[4]) if len(sys.argv) > 4 else 16, sys.argv[3] if len(sys.argv) > 3 else 'length', sys.argv[1])
+
+
+if __name__ == '__main__':
+    main()
@@ -8,10 +8,13 @@ from src.highwayRouter import HighwayRouter
 # this mapper class contains all necessary mapping functions in order to make visualizing this project very easy
 class mapper():
 
-    # create a highway network and a router
-    def __init__(self, threshold=5000):
-        self.hw = network()
-        self.router = HighwayRouter(self.hw, self, threshold)
+    # create a highway network and a router, loading from a compiled snapshot if one is given
+    # engine, metric, candidates, heuristic, hierarchy and landmarks are passed through to the router, and cache, overpass and
+    # shards are passed through to the network
+    def __init__(self, threshold=5000, snapshot=None, engine='ways', metric='distance', cache=None, overpass=None, shards=None, candidates=1,
+                 heuristic='haversine', hierarchy=None, landmarks=None):
+        self.hw = network.from_snapshot(snapshot, cache, overpass) if snapshot else network(cache=cache, overpass=overpass, shards=shards)
+        self.router = HighwayRouter(self.hw, self, threshold, engine, heuristic, metric, candidates=candidates, hierarchy=hierarchy, landmarks=landmarks)
 
     # DEPRECATED
     # this maps all highways within a specific bounding box where s and e are pairs of coordinates
@@ -0,0 +1,33 @@
+#!/opt/homebrew/bin/python3
+
+import json
+import sqlite3
+import threading
+
+# persistent cache of Overpass neighbor road lookups keyed by node id
+# results are stored as the same road dictionaries we keep in the json tiles, and an empty list records that a node has no
+# new roads so we never ask Overpass about it again. sqlite handles locking, so every worker on a host can share one file
+class NeighborCache:
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(path, timeout=30, check_same_thread=False)
+
+        # write ahead logging lets other processes keep reading while one of them writes
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute('CREATE TABLE IF NOT EXISTS neighbors (node INTEGER PRIMARY KEY, ways TEXT NOT NULL)')
+        self.db.commit()
+
+    # returns the cached road dictionaries for a node, or None if we have never looked it up
+    def get(self, nodeId: int) -> list:
+        with self.lock:
+            row = self.db.execute('SELECT ways FROM neighbors WHERE node = ?', (nodeId,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def put(self, nodeId: int, ways: list) -> None:
+        with self.lock:
+            self.db.execute('INSERT OR REPLACE INTO neighbors (node, ways) VALUES (?, ?)', (nodeId, json.dumps(ways, separators=(',', ':'))))
+            self.db.commit()
+
+    def close(self) -> None:
+        self.db.close()
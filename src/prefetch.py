@@ -0,0 +1,129 @@
+#!/opt/homebrew/bin/python3
+
+import os, sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from concurrent.futures import Future, ThreadPoolExecutor
+from threading import Event, Lock, Timer
+from src import quadtree
+
+# runs Overpass neighbor lookups in the background while a search keeps going
+# lookups are started as soon as a dangling way is pushed onto the priority queue, so by the time the search pops it the
+# missing roads are usually already fetched. worker threads only ever fetch road dictionaries, the tree itself is only
+# changed on the searching thread when results are collected, so it never needs a lock of its own
+# nodes scheduled within window seconds of each other are looked up together in one query of up to batchSize nodes
+# a lookup gives up after retries failed attempts, so a worker never spins forever when Overpass cannot be reached
+class NeighborPrefetcher:
+    def __init__(self, tree: quadtree.QuadTree, workers: int = 4, batchSize: int = 16, window: float = 0.05, retries: int = 3) -> None:
+        self.tree = tree
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='prefetch')
+        self.lock = Lock()
+        self.batchSize = batchSize
+        self.window = window
+        self.retries = retries
+
+        # batches handed to the pool that may not have finished, and the event that tells the running ones to give up
+        self.jobs = []
+        self.stop = Event()
+
+        # futures for lookups that are queued or running, keyed by node id so a node is only ever fetched once at a time
+        self.pending = {}
+
+        # nodes waiting for the current batch to be sent, and the timer that sends it once the window closes
+        self.batch = []
+        self.timer = None
+
+        # nodes whose roads have already been added to the tree
+        self.resolved = set()
+
+    # starts fetching the roads around a node unless that is already done or underway
+    def schedule(self, node: quadtree.Node) -> None:
+        with self.lock:
+            if node.id in self.pending or node.id in self.resolved:
+                return
+            self.pending[node.id] = Future()
+            self.batch.append(node.id)
+            if len(self.batch) >= self.batchSize:
+                self._send()
+            elif not self.timer:
+                self.timer = Timer(self.window, self.flush)
+                self.timer.daemon = True
+                self.timer.start()
+
+    # sends whatever nodes are waiting right away instead of waiting for the window to close
+    def flush(self) -> None:
+        with self.lock:
+            self._send()
+
+    # hands the current batch to a worker, the lock must be held
+    def _send(self) -> None:
+        if self.timer:
+            self.timer.cancel()
+            self.timer = None
+        if self.batch:
+            self.jobs = [job for job in self.jobs if not job.done()]
+            self.jobs.append(self.pool.submit(self._fetch, self.batch, [self.pending[nodeId] for nodeId in self.batch], self.stop))
+            self.batch = []
+
+    # runs on a worker, splitting one batched lookup back out to the future of every node in it
+    def _fetch(self, nodeIds: list, futures: list, stop: Event) -> None:
+        try:
+            found = self.tree.fetchNeighborRoadsBatch(nodeIds, self.retries, stop)
+        except Exception as e:
+            for future in futures:
+                future.set_exception(e)
+            return
+        for nodeId, future in zip(nodeIds, futures):
+            future.set_result(found[nodeId])
+
+    # adds the roads from every lookup that has finished to the tree without waiting on the rest
+    def collect(self) -> None:
+        with self.lock:
+            done = [nodeId for nodeId, future in self.pending.items() if future.done()]
+        for nodeId in done:
+            self._apply(nodeId)
+
+    # makes sure the roads around a node are in the tree, only blocking if its lookup has not finished yet
+    def resolve(self, node: quadtree.Node) -> None:
+        if node.id in self.resolved:
+            return
+        self.schedule(node)
+
+        # nothing else is worth waiting for once the search is stuck on this node
+        self.flush()
+        self._apply(node.id)
+
+    # a lookup that failed is dropped without marking the node resolved, so the search carries on as if the road ends there
+    # and a later search can try Overpass again
+    def _apply(self, nodeId: int) -> None:
+        with self.lock:
+            future = self.pending.pop(nodeId, None)
+        if future is None:
+            return
+        try:
+            found = future.result()
+        except Exception:
+            return
+        with self.lock:
+            self.resolved.add(nodeId)
+        for wayData in found:
+            self.tree.add(quadtree.Way(wayData))
+
+    # drops every lookup that has not been collected, called once a search finishes so nothing keeps running behind it
+    # queued batches never start and running ones give up before their next attempt, the prefetcher can still be used after
+    def cancel(self) -> None:
+        with self.lock:
+            if self.timer:
+                self.timer.cancel()
+                self.timer = None
+            for job in self.jobs:
+                job.cancel()
+            self.jobs = []
+            self.batch = []
+            self.pending = {}
+            self.stop.set()
+            self.stop = Event()
+
+    # cancels everything and stops the workers for good, a running Overpass request is left to finish on its own
+    def close(self) -> None:
+        self.cancel()
+        self.pool.shutdown(wait=False, cancel_futures=True)
@@ -1,7 +1,7 @@
 #!/opt/homebrew/bin/python3
 
-from math import radians, sin, cos, asin, sqrt, inf
-from copy import deepcopy
+from math import radians, degrees, sin, cos, tan, asin, atan2, sqrt, inf
+import heapq
 import time
 import os, sys
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
@@ -24,7 +24,10 @@ def getDistance(p1: list, p2: list) -> float:
     return 3956 * 2 * asin(sqrt(a))
 
 
+# nodes and ways use __slots__ instead of a __dict__ each, which matters with millions of them loaded
 class Node:
+    __slots__ = ('id', 'lat', 'lon')
+
     def __init__(self, data: dict) -> None:
         self.id = data['id']
         self.lat = data['lat']
@@ -32,6 +35,8 @@ class Node:
 
 
 class Way:
+    __slots__ = ('id', 'length', 'time', 'tags', 'start', 'end', 'oneway', 'forward', '_reverse')
+
     def __init__(self, data: dict) -> None:
         self.id = data['id']
         self.length = data['length_mi']
@@ -40,6 +45,33 @@ class Way:
         self.start = Node(data['startNode'])
         self.end = Node(data['endNode'])
         self.oneway = True if 'oneway' in self.tags and self.tags['oneway'] == 'yes' else False
+        self.forward = True
+        self._reverse = None
+
+    # builds a way from already decoded parts, used when loading a compiled network snapshot
+    @classmethod
+    def fromParts(cls, id: int, length: float, time: float, tags: dict, start: Node, end: Node) -> 'Way':
+        way = cls.__new__(cls)
+        way.id = id
+        way.length = length
+        way.time = time
+        way.tags = tags
+        way.start = start
+        way.end = end
+        way.oneway = True if 'oneway' in tags and tags['oneway'] == 'yes' else False
+        way.forward = True
+        way._reverse = None
+        return way
+
+    # returns a view of this way driven from end to start, created once and shared by every search
+    # the view shares the id, tags and nodes of the way it reverses
+    def reverse(self) -> 'Way':
+        if self._reverse is None:
+            reverse = Way.fromParts(self.id, self.length, self.time, self.tags, self.end, self.start)
+            reverse.forward = not self.forward
+            reverse._reverse = self
+            self._reverse = reverse
+        return self._reverse
 
     def __str__(self) -> str:
         i = f'\n\tRoad {self.id}\n'
@@ -62,65 +94,132 @@ class BoundingBox:
             return True
         return False
 
+    # shortest distance in miles from a point to anywhere in the box, 0 inside it
+    # a point beside the box is closest to the nearer east or west edge, at the latitude where the great circle from the point
+    # meets that meridian at a right angle (clamped to the edge), so this never overestimates and can be used to prune searches
+    def distanceTo(self, point: list) -> float:
+        minLat = self.center[0] - self.height / 2
+        maxLat = self.center[0] + self.height / 2
+        minLon = self.center[1] - self.width / 2
+        maxLon = self.center[1] + self.width / 2
+        lat, lon = point
+
+        if minLon <= lon <= maxLon:
+            return getDistance(point, [min(max(lat, minLat), maxLat), lon])
+
+        edge = minLon if abs(lon - minLon) < abs(lon - maxLon) else maxLon
+        nearest = degrees(atan2(tan(radians(lat)), cos(radians(lon - edge))))
+        return getDistance(point, [min(max(nearest, minLat), maxLat), edge])
+
+
+# hash index from node ids to the directed ways leaving and arriving at them, so finding connected roads is a dictionary lookup
+# two way roads are stored in both directions using their shared reverse views
+# the index also keeps the one shared copy of every node by id and of every distinct set of tags, and points each way it
+# takes at those, so a junction where four roads meet is one Node and the thousands of identical motorway tags are one dict
+class NodeIndex:
+    def __init__(self) -> None:
+        self.ways = {}
+        self.outgoing = {}
+        self.incoming = {}
+        self.nodes = {}
+        self.tags = {}
+
+    def add(self, way: Way) -> bool:
+        if way.id in self.ways:
+            return False
+        way.start = self.nodes.setdefault(way.start.id, way.start)
+        way.end = self.nodes.setdefault(way.end.id, way.end)
+        way.tags = self.tags.setdefault(tuple(sorted(way.tags.items())), way.tags)
+        self.ways[way.id] = way
+        edges = [way] if way.oneway or way.start.id == way.end.id else [way, way.reverse()]
+        for edge in edges:
+            self.outgoing.setdefault(edge.start.id, []).append(edge)
+            self.incoming.setdefault(edge.end.id, []).append(edge)
+        return True
+
+    # returns all directed ways we can drive onto from the end of the given way
+    # the list is shared between searches and can include the reverse of the way itself, so callers skip matching ids
+    def getConnected(self, way: Way) -> list:
+        return self.outgoing.get(way.end.id, [])
+
 
 class QuadTree:
     MAX_WAYS = 10
 
-    def __init__(self, bounds: BoundingBox) -> None:
+    # trees this deep never divide again, about 20 m across over the lower 48, so a cluster of road ends on the same spot
+    # (like a big interchange) makes one crowded leaf instead of an endlessly deep tree
+    MAX_DEPTH = 20
+
+    # only the root of a tree carries a node index, the quadtree itself is just used for spatial queries
+    # the root can also be given a NeighborCache to remember Overpass lookups across runs, and an Overpass url to use instead of the public server
+    # an offline tree never queries Overpass and only knows about roads that are loaded or cached
+    def __init__(self, bounds: BoundingBox, index: NodeIndex = None) -> None:
         self.bounds = bounds
+        self.index = index
+        self.cache = None
+        self.overpassUrl = None
+        self.offline = False
         self.ways = []
         self.ul = None
         self.ur = None
         self.ll = None
         self.lr = None
         self.size = 0
+        self.level = 0
     
     def __str__(self) -> str:
-        s = f'Size: {self.size}'
-        w = ''
-        for way in self.ways:
-            w += str(way)
-        d = '\n'
-        if self.ul:
-            d += 'UR\n'
-            d += '\n'.join(['  ' + i for i in str(self.ur).strip().split('\n')])
-            d += '\nUL\n'
-            d += '\n'.join(['  ' + i for i in str(self.ul).strip().split('\n')])
-            d += '\nLL\n'
-            d += '\n'.join(['  ' + i for i in str(self.ll).strip().split('\n')])
-            d += '\nLR\n'
-            d += '\n'.join(['  ' + i for i in str(self.lr).strip().split('\n')])
-        return s + w + d  
+        lines = []
+        stack = [(self, '')]
+        while stack:
+            t, indent = stack.pop()
+            if isinstance(t, str):
+                lines.append(indent + t)
+                continue
+            lines.append(f'{indent}Size: {t.size}')
+            for way in t.ways:
+                lines.extend([indent + line for line in str(way).strip('\n').split('\n')])
+            if t.ul:
+                for label, child in [('LR', t.lr), ('LL', t.ll), ('UL', t.ul), ('UR', t.ur)]:
+                    stack.append((child, indent + '  '))
+                    stack.append((label, indent))
+        return '\n'.join(lines)
 
     def add(self, way: Way) -> None:
+        # ways we already have (like ones returned again by an Overpass query) are ignored
+        if self.index is not None and not self.index.add(way):
+            return
         self._add(way, way.start)
         self._add(way, way.end)
 
+    # walks down to the leaf holding node and adds the way there, dividing full leaves on the way
     def _add(self, way: Way, node: Node) -> None:
         if not self.bounds.containsNode(node):
             return
 
-        if not self.ul and len(self.ways) < self.MAX_WAYS:
-            if way in self.ways:
+        t = self
+        while t:
+            if not t.ul and (len(t.ways) < self.MAX_WAYS or t.level >= self.MAX_DEPTH):
+                if way in t.ways:
+                    return
+                t.size += 1
+                t.ways.append(way)
                 return
-            self.size += 1
-            self.ways.append(way)  
-        
-        else:
-            if not self.ul:
-                self.__divide()
-            
-            if self.ul.bounds.containsNode(node):
-                self.ul._add(way, node)
-            elif self.ur.bounds.containsNode(node):
-                self.ur._add(way, node)
-            elif self.ll.bounds.containsNode(node):
-                self.ll._add(way, node)
-            elif self.lr.bounds.containsNode(node):
-                self.lr._add(way, node)
-            
-            self.size += 1
-    
+
+            if not t.ul:
+                t.__divide()
+            t.size += 1
+
+            if t.ul.bounds.containsNode(node):
+                t = t.ul
+            elif t.ur.bounds.containsNode(node):
+                t = t.ur
+            elif t.ll.bounds.containsNode(node):
+                t = t.ll
+            elif t.lr.bounds.containsNode(node):
+                t = t.lr
+            else:
+                t = None
+
     def __divide(self) -> None:
         c = self.bounds.center
         h = self.bounds.height
@@ -138,6 +237,8 @@ class QuadTree:
         self.ul = QuadTree(bbs[1])
         self.ur = QuadTree(bbs[2])
         self.lr = QuadTree(bbs[3])
+        for child in [self.ll, self.ul, self.ur, self.lr]:
+            child.level = self.level + 1
 
         for w in self.ways:
             nodes = []
@@ -158,361 +259,197 @@ class QuadTree:
 
         self.ways = []
 
+    # builds a whole tree from a list of ways at once instead of adding them one by one
+    # every cell is split once, straight into its final quadrants, so no leaf is ever filled, divided and redistributed again
+    # each level of the tree is a single pass over the road ends below it, so the build is O(n log n)
+    # cells end up holding the same roads that add would put there, so queries on either tree find the same ways
+    @classmethod
+    def build(cls, bounds: BoundingBox, ways: list, index: NodeIndex = None) -> 'QuadTree':
+        root = cls(bounds, index)
+
+        # one entry per road end inside the tree, skipping roads the index already has
+        entries = []
+        for way in ways:
+            if index is not None and not index.add(way):
+                continue
+            for node in [way.start, way.end]:
+                if bounds.containsNode(node):
+                    entries.append((way, node))
+
+        stack = [(root, entries)]
+        while stack:
+            t, entries = stack.pop()
+            distinct = list(dict.fromkeys([way for way, node in entries]))
+
+            # trees at MAX_DEPTH keep every road that reaches them, the same as add
+            if len(distinct) <= cls.MAX_WAYS or t.level >= cls.MAX_DEPTH:
+                t.ways = distinct
+                t.size = len(distinct)
+                continue
+
+            t.__divide()
+            t.size = len(entries)
+
+            # the edges of each quadrant worked out the same way containsNode does, so ends on a shared edge land where add puts them
+            children = [t.ul, t.ur, t.ll, t.lr]
+            edges = []
+            for child in children:
+                b = child.bounds
+                edges.append((b.center[0] - b.height / 2, b.center[0] + b.height / 2, b.center[1] - b.width / 2, b.center[1] + b.width / 2))
+            quadrants = [[], [], [], []]
+            for entry in entries:
+                node = entry[1]
+                lat = node.lat
+                lon = node.lon
+                for i in range(4):
+                    minLat, maxLat, minLon, maxLon = edges[i]
+                    if minLat <= lat <= maxLat and minLon <= lon <= maxLon:
+                        quadrants[i].append(entry)
+                        break
+            stack.extend(zip(children, quadrants))
+
+        return root
+
+    # deepest level below this tree, 0 for a leaf
+    def depth(self) -> int:
+        deepest = 0
+        stack = [(self, 0)]
+        while stack:
+            t, d = stack.pop()
+            deepest = max(deepest, d)
+            if t.ul:
+                stack.extend([(t.ul, d + 1), (t.ur, d + 1), (t.ll, d + 1), (t.lr, d + 1)])
+        return deepest
+
+    # every leaf whose bounds overlap the box from south west corner s, w to north east corner n, e
+    def leavesIn(self, s: float, w: float, n: float, e: float) -> list:
+        leaves = []
+        stack = [self]
+        while stack:
+            t = stack.pop()
+            b = t.bounds
+            if b.center[0] - b.height / 2 > n or b.center[0] + b.height / 2 < s or b.center[1] - b.width / 2 > e or b.center[1] + b.width / 2 < w:
+                continue
+            if t.ul:
+                stack.extend([t.lr, t.ll, t.ur, t.ul])
+            else:
+                leaves.append(t)
+        return leaves
+
     def getConnected(self, way: Way) -> list:
-        connected = []
-        node = way.end
-        if not self.ul:
-            for w in self.ways:
-                if w.id == way.id:
-                    continue
-                if w.start.id == node.id:
-                    connected.append(w)
-                elif w.end.id == node.id and not w.oneway:
-                    reverse = deepcopy(w)
-                    reverse.start, reverse.end = reverse.end, reverse.start
-                    connected.append(reverse)
-            if not connected:
-                return []
-            return connected
-        else:
-            if self.ul.bounds.containsNode(node):
-                return self.ul.getConnected(way)
-            elif self.ur.bounds.containsNode(node):
-                return self.ur.getConnected(way)
-            elif self.ll.bounds.containsNode(node):
-                return self.ll.getConnected(way)
-            elif self.lr.bounds.containsNode(node):
-                return self.lr.getConnected(way)
+        return self.index.getConnected(way)
     
 
+    # the entry way near the start coordinates and the exit way near the end coordinates of a route
     def getEndWays(self, start: list, end: list) -> dict:
         return {'start': self.getClosestWay(start, end)[0], 'end': self.getClosestWay(start, end, f='end')[0]}
 
-    def getClosestWay(self, start: list, end: list, visited = set(), f = 'start') -> Way:
-        # check if quadtree has been visited already
-        minDist = inf
-        w = None
-        # if self in visited:
-        #     return w, minDist
-        
-        # if not, check current quadtree
-        visited.add(self)
-
-        if not self.ul:
-            for way in self.ways:
-                snode = way.start
-                snlat = snode.lat
-                snlon = snode.lon
-
-                enode = way.end
-                enlat = enode.lat
-                enlon = enode.lon
-
-                # distance from start coordinates to start node
-                dist1 = getDistance(start, [snlat, snlon])
-                # distance from start coordinates to end node
-                dist2 = getDistance(start, [enlat, enlon])
-                # distance from end coordinates to start node
-                snDist = getDistance(end, [snlat, snlon])
-                # distance from end coordinates to end node
-                enDist = getDistance(end, [enlat, enlon])
-
-                # if the distance to the start is better and the road gets us closer to our destination, use it
-                if f == 'start':
-                    if dist1 < minDist and enDist < snDist:
-                        minDist = dist1
-                        w = way
-                else:
-                    if enDist < minDist and dist1 < dist2:
-                        minDist = enDist
-                        w = way
-            
-            return w, minDist
-        
-        # search the child quadtree containing the start coordinates
-        else:
-            node = Node({'id': -1, 'lat': start[0], 'long': start[1]}) if f == 'start' else Node({'id': -1, 'lat': end[0], 'long': end[1]})
-            newMin = inf
-
-            nearestChild = self.closestChild(node)
-            newW, newMin = nearestChild.getClosestWay(start, end, visited, f)
-
-            # if self.ul.bounds.containsNode(node):
-            #     newW, newMin = self.ul.getClosestWay(start, end, visited, f)
-            # elif self.ur.bounds.containsNode(node):
-            #     newW, newMin = self.ur.getClosestWay(start, end, visited, f)
-            # elif self.ll.bounds.containsNode(node):
-            #     newW, newMin = self.ll.getClosestWay(start, end, visited, f)
-            # elif self.lr.bounds.containsNode(node):
-            #     newW, newMin = self.lr.getClosestWay(start, end, visited, f)
-
-            if newMin < minDist:
-                minDist, w = newMin, newW
-        
-            # search neighboring quadtrees if their bounds are closer than the distance to the current best way
-
-            # dlat and dlon give distance directly to the latitudinal and longitudinal axes of the current quadtree
-            dlat = getDistance([self.bounds.center[0], start[1]], start) if f == 'start' else getDistance([self.bounds.center[0], end[1]], end)
-            dlon = getDistance([start[0], self.bounds.center[1]], start) if f == 'start' else getDistance([end[0], self.bounds.center[1]], end)
-
-            # latdir and londir specify which quadrant we just searched
-            #     londir
-            #  1, -1 |  1, 1
-            # -------------- latdir
-            # -1, -1 | -1, 1
-            if f == 'start':
-                latdir = 1 if start[0] >= self.bounds.center[0] else -1
-                londir = 1 if start[1] >= self.bounds.center[1] else -1
-            else:
-                latdir = 1 if end[0] >= self.bounds.center[0] else -1
-                londir = 1 if end[1] >= self.bounds.center[1] else -1
-
-            # ABOVE/BELOW
-            # if the distance to latitudinal axis < distance to best way, check quadrant above/below the one just searched and compare to current best way
-            if abs(dlat) < minDist:
-                if latdir == 1:
-                    if londir == 1:
-                        newW, newMin = self.lr.getClosestWay(start, end, visited, f=f)
-                        if newMin < minDist:
-                            minDist, w = newMin, newW
-                    else:
-                        newW, newMin = self.ll.getClosestWay(start, end, visited, f=f)
-                        if newMin < minDist:
-                            minDist, w = newMin, newW
-                else:
-                    if londir == 1:
-                        newW, newMin = self.ur.getClosestWay(start, end, visited, f=f)
-                        if newMin < minDist:
-                            minDist, w = newMin, newW
-                    else:
-                        newW, newMin = self.ul.getClosestWay(start, end, visited, f=f)
-                        if newMin < minDist:
-                            minDist, w = newMin, newW
-            
-            # LEFT/RIGHT
-            # if the distance to longitudinal axis < distance to best way, check quadrant left/right the one just searched and compare to current best way
-            if abs(dlon) < minDist:
-                if londir == 1:
-                    if latdir == 1:
-                        newW, newMin = self.ul.getClosestWay(start, end, visited, f=f)
-                        if newMin < minDist:
-                            minDist, w = newMin, newW
-                    else:
-                        newW, newMin = self.ll.getClosestWay(start, end, visited, f=f)
-                        if newMin < minDist:
-                            minDist, w = newMin, newW
-                else:
-                    if latdir == 1:
-                        newW, newMin = self.ur.getClosestWay(start, end, visited, f=f)
-                        if newMin < minDist:
-                            minDist, w = newMin, newW
-                    else:
-                        newW, newMin = self.lr.getClosestWay(start, end, visited, f=f)
-                        if newMin < minDist:
-                            minDist, w = newMin, newW
-            
-            # DIAGONAL
-            # if the distance to center < distance to best way, check quadrant diagonal the one just searched and compare to current best way
-            if sqrt(abs(dlat)**2 + abs(dlon)**2) < minDist:
-                if londir == 1:
-                    if latdir == 1:
-                        newW, newMin = self.ll.getClosestWay(start, end, visited, f=f)
-                        if newMin < minDist:
-                            minDist, w = newMin, newW
-                    else:
-                        newW, newMin = self.ul.getClosestWay(start, end, visited, f=f)
-                        if newMin < minDist:
-                            minDist, w = newMin, newW
-                else:
-                    if latdir == 1:
-                        newW, newMin = self.lr.getClosestWay(start, end, visited, f=f)
-                        if newMin < minDist:
-                            minDist, w = newMin, newW
-                    else:
-                        newW, newMin = self.ur.getClosestWay(start, end, visited, f=f)
-                        if newMin < minDist:
-                            minDist, w = newMin, newW
-        
-        return w, minDist
-
-
-    def closestChild(self, node: Node):
-        if not self.ul:
-            return None
-        elif self.ul.bounds.containsNode(node):
-            return self.ul
-        elif self.ur.bounds.containsNode(node):
-            return self.ur
-        elif self.ll.bounds.containsNode(node):
-            return self.ll
-        elif self.lr.bounds.containsNode(node):
-            return self.lr
-        else:
-            dUL = getDistance([node.lat, node.lon], self.ul.bounds.center)
-            dUR = getDistance([node.lat, node.lon], self.ur.bounds.center)
-            dLL = getDistance([node.lat, node.lon], self.ll.bounds.center)
-            dLR = getDistance([node.lat, node.lon], self.ul.bounds.center)
-            best = min(dUL, dUR, dLL, dLR)
-            if best == dUL:
-                return self.ul
-            elif best == dUR:
-                return self.ur
-            elif best == dLL:
-                return self.ll
-            else:
-                return self.lr
-    
-    def getClosestWayMap(self, start: list, end: list, f = 'start', boxes = [], ways = []) -> Way:
-        # check if quadtree has been visited already
-        minDist = inf
-        w = None
-        boxes.append(self.bounds)
-
-        if not self.ul:
-            for way in self.ways:
-                snode = way.start
-                snlat = snode.lat
-                snlon = snode.lon
-
-                enode = way.end
-                enlat = enode.lat
-                enlon = enode.lon
-
-                # distance from start coordinates to start node
-                dist1 = getDistance(start, [snlat, snlon])
-                # distance from start coordinates to end node
-                dist2 = getDistance(start, [enlat, enlon])
-                # distance from end coordinates to start node
-                snDist = getDistance(end, [snlat, snlon])
-                # distance from end coordinates to end node
-                enDist = getDistance(end, [enlat, enlon])
-
-                # if the distance to the start is better and the road gets us closer to our destination, use it
-                if f == 'start':
-                    if dist1 < minDist and enDist < snDist:
-                        minDist = dist1
-                        w = way
-                else:
-                    if enDist < minDist and enDist < snDist:
-                        minDist = enDist
-                        w = way
-            
-            if w:
-                ways.append(w)
-            return w, minDist, boxes, ways
-        
-        # search the child quadtree containing the start coordinates
-        else:
-            node = Node({'id': -1, 'lat': start[0], 'long': start[1]}) if f == 'start' else Node({'id': -1, 'lat': end[0], 'long': end[1]})
-            newMin = inf
-
-            nearestChild = self.closestChild(node)
-            newW, newMin, boxes, ways = nearestChild.getClosestWayMap(start, end, f, boxes)
-
-            # if self.ul.bounds.containsNode(node):
-            #     newW, newMin = self.ul.getClosestWay(start, end, visited, f)
-            # elif self.ur.bounds.containsNode(node):
-            #     newW, newMin = self.ur.getClosestWay(start, end, visited, f)
-            # elif self.ll.bounds.containsNode(node):
-            #     newW, newMin = self.ll.getClosestWay(start, end, visited, f)
-            # elif self.lr.bounds.containsNode(node):
-            #     newW, newMin = self.lr.getClosestWay(start, end, visited, f)
-
-            if newMin < minDist:
-                minDist, w = newMin, newW
-        
-            # search neighboring quadtrees if their bounds are closer than the distance to the current best way
-
-            # dlat and dlon give distance directly to the latitudinal and longitudinal axes of the current quadtree
-            dlat = getDistance([self.bounds.center[0], start[1]], start) if f == 'start' else getDistance([self.bounds.center[0], end[1]], end)
-            dlon = getDistance([start[0], self.bounds.center[1]], start) if f == 'start' else getDistance([end[0], self.bounds.center[1]], end)
-
-            # latdir and londir specify which quadrant we just searched
-            #     londir
-            #  1, -1 |  1, 1
-            # -------------- latdir
-            # -1, -1 | -1, 1
-            if f == 'start':
-                latdir = 1 if start[0] >= self.bounds.center[0] else -1
-                londir = 1 if start[1] >= self.bounds.center[1] else -1
-            else:
-                latdir = 1 if end[0] >= self.bounds.center[0] else -1
-                londir = 1 if end[1] >= self.bounds.center[1] else -1
-
-            # ABOVE/BELOW
-            # if the distance to latitudinal axis < distance to best way, check quadrant above/below the one just searched and compare to current best way
-            if abs(dlat) < minDist:
-                if latdir == 1:
-                    if londir == 1:
-                        newW, newMin, boxes, ways = self.lr.getClosestWayMap(start, end, f, boxes, ways)
-                        if newMin < minDist:
-                            minDist, w = newMin, newW
-                    else:
-                        newW, newMin, boxes, ways = self.ll.getClosestWayMap(start, end, f, boxes, ways)
-                        if newMin < minDist:
-                            minDist, w = newMin, newW
-                else:
-                    if londir == 1:
-                        newW, newMin, boxes, ways = self.ur.getClosestWayMap(start, end, f, boxes, ways)
-                        if newMin < minDist:
-                            minDist, w = newMin, newW
-                    else:
-                        newW, newMin, boxes, ways = self.ul.getClosestWayMap(start, end, f, boxes, ways)
-                        if newMin < minDist:
-                            minDist, w = newMin, newW
-            
-            # LEFT/RIGHT
-            # if the distance to longitudinal axis < distance to best way, check quadrant left/right the one just searched and compare to current best way
-            if abs(dlon) < minDist:
-                if londir == 1:
-                    if latdir == 1:
-                        newW, newMin, boxes, ways = self.ul.getClosestWayMap(start, end, f, boxes, ways)
-                        if newMin < minDist:
-                            minDist, w = newMin, newW
-                    else:
-                        newW, newMin, boxes, ways = self.ll.getClosestWayMap(start, end, f, boxes, ways)
-                        if newMin < minDist:
-                            minDist, w = newMin, newW
-                else:
-                    if latdir == 1:
-                        newW, newMin, boxes, ways = self.ur.getClosestWayMap(start, end, f, boxes, ways)
-                        if newMin < minDist:
-                            minDist, w = newMin, newW
-                    else:
-                        newW, newMin, boxes, ways = self.lr.getClosestWayMap(start, end, f, boxes, ways)
-                        if newMin < minDist:
-                            minDist, w = newMin, newW
-            
-            # DIAGONAL
-            # if the distance to center < distance to best way, check quadrant diagonal the one just searched and compare to current best way
-            if sqrt(abs(dlat)**2 + abs(dlon)**2) < minDist:
-                if londir == 1:
-                    if latdir == 1:
-                        newW, newMin, boxes, ways = self.ll.getClosestWayMap(start, end, f, boxes, ways)
-                        if newMin < minDist:
-                            minDist, w = newMin, newW
-                    else:
-                        newW, newMin, boxes, ways = self.ul.getClosestWayMap(start, end, f, boxes, ways)
-                        if newMin < minDist:
-                            minDist, w = newMin, newW
-                else:
-                    if latdir == 1:
-                        newW, newMin, boxes, ways = self.lr.getClosestWayMap(start, end, f, boxes, ways)
-                        if newMin < minDist:
-                            minDist, w = newMin, newW
-                    else:
-                        newW, newMin, boxes, ways = self.ur.getClosestWayMap(start, end, f, boxes, ways)
-                        if newMin < minDist:
-                            minDist, w = newMin, newW
-        
-        return w, minDist, boxes, ways
-    
+    # returns (way, distance) for the way whose start is nearest the start coordinates and that heads towards the end coordinates,
+    # or with f = 'end' the way whose end is nearest the end coordinates and that comes from the direction of the start
+    # visited, when given, collects every tree the search looked at
+    def getClosestWay(self, start: list, end: list, visited: set = None, f = 'start') -> Way:
+        trees = [] if visited is not None else None
+        found = self.nearestWays(start if f == 'start' else end, 1, f, self.heading(start, end, f), trees)
+        if visited is not None:
+            visited.update(trees)
+        return (found[0][1], found[0][0]) if found else (None, inf)
+
+    # only ways that get us closer to our destination are worth starting on, and only ways coming from the start worth ending on
+    def heading(self, start: list, end: list, f = 'start'):
+        if f == 'start':
+            return lambda way: getDistance(end, [way.end.lat, way.end.lon]) < getDistance(end, [way.start.lat, way.start.lon])
+        return lambda way: getDistance(start, [way.start.lat, way.start.lon]) < getDistance(start, [way.end.lat, way.end.lon])
+
+    # best first search for the k ways whose start (or end with f = 'end') is nearest to point, returned as a list of
+    # (distance, way) pairs from nearest to furthest. trees are taken off a priority queue ordered by the distance from point to
+    # their bounds, so we stop as soon as the next tree is further away than the k-th best way found so far
+    # accept can filter out ways we do not want, and visited collects every tree the search looked at when given
+    def nearestWays(self, point: list, k: int = 1, f = 'start', accept = None, visited: list = None) -> list:
+        queue = [(self.bounds.distanceTo(point), 0, self)]
+        count = 1
+
+        # the k best ways so far as a max heap of (-distance, -id, way), and the ids of every way already looked at
+        # ways the same distance away (like every road at a junction) are ranked by id, so the answer never depends on the tree
+        best = []
+        seen = set()
+
+        while queue:
+            dist, _, t = heapq.heappop(queue)
+            if len(best) == k and dist > -best[0][0]:
+                break
+            if visited is not None:
+                visited.append(t)
+
+            if t.ul:
+                for child in [t.ul, t.ur, t.ll, t.lr]:
+                    heapq.heappush(queue, (child.bounds.distanceTo(point), count, child))
+                    count += 1
+                continue
+
+            # ways are stored in the leaves holding either of their ends, the one holding the end we measure is where we score it
+            for way in t.ways:
+                node = way.start if f == 'start' else way.end
+                if way.id in seen or not t.bounds.containsNode(node):
+                    continue
+                seen.add(way.id)
+                if accept and not accept(way):
+                    continue
+                d = getDistance(point, [node.lat, node.lon])
+                if len(best) < k:
+                    heapq.heappush(best, (-d, -way.id, way))
+                elif (d, way.id) < (-best[0][0], -best[0][1]):
+                    heapq.heapreplace(best, (-d, -way.id, way))
+
+        return [(-d, way) for d, _, way in sorted(best, key=lambda entry: (-entry[0], -entry[1]))]
+
+    # same search as getClosestWay, also returning the bounds of every tree looked at and the nearest candidate ways
+    def getClosestWayMap(self, start: list, end: list, f = 'start', boxes: list = None, ways: list = None, k: int = 10) -> Way:
+        boxes = [] if boxes is None else boxes
+        ways = [] if ways is None else ways
+
+        trees = []
+        found = self.nearestWays(start if f == 'start' else end, k, f, self.heading(start, end, f), trees)
+        boxes.extend(t.bounds for t in trees)
+        ways.extend(way for dist, way in found)
+        if not found:
+            return None, inf, boxes, ways
+        return found[0][1], found[0][0], boxes, ways
+
     def queryNeighborRoads(self, node) -> None:
+        for wayData in self.fetchNeighborRoads(node.id):
+            self.add(Way(wayData))
+
+    # returns road dictionaries for every way touching a node, asking Overpass only if the cache has not seen the node before
+    def fetchNeighborRoads(self, nodeId: int) -> list:
+        return self.fetchNeighborRoadsBatch([nodeId])[nodeId]
+
+    # same as fetchNeighborRoads for many nodes at once, every node the cache does not know is resolved in a single Overpass query
+    # returns a dictionary from each node id to the road dictionaries touching that node
+    # a failed query is tried again forever unless retries caps how many more attempts it gets, after which the last error is
+    # raised. stop is an optional threading.Event that makes us give up before the next attempt once it is set
+    def fetchNeighborRoadsBatch(self, nodeIds: list, retries: int = None, stop = None) -> dict:
+        found = {}
+        missing = []
+        for nodeId in nodeIds:
+            cached = self.cache.get(nodeId) if self.cache else None
+            if cached is not None:
+                found[nodeId] = cached
+            elif nodeId not in missing:
+                missing.append(nodeId)
+        if not missing:
+            return found
+
+        # offline we simply have nothing new, but that is not worth caching since Overpass might know better later
+        if self.offline:
+            for nodeId in missing:
+                found[nodeId] = []
+            return found
+
         keepTags = ['highway', 'lanes', 'maxspeed', 'name', 'oneway', 'ref', 'surface']
-        api = overpy.Overpass()
+        api = overpy.Overpass(url=self.overpassUrl)
         querybox = f"""
             [out:json][timeout:600];
-            node(id:{node.id});
+            node(id:{','.join(str(nodeId) for nodeId in missing)});
             way(bn)->.w;
             way(bn);
             convert length 'length'=length(),::id=id(),'type'='length';
@@ -524,22 +461,32 @@ class QuadTree:
         """
     
         result = None
+        attempts = 0
         while result == None:
+            if stop is not None and stop.is_set():
+                raise RuntimeError(f'Overpass lookup of nodes {missing} cancelled')
             try:
-                result = api.query(querybox)
-            except:
-                time.sleep(0.5)
+                result = api.query(querybox, lean_tags=keepTags)
+            except Exception:
+                attempts += 1
+                if retries is not None and attempts > retries:
+                    raise
+                if stop is not None:
+                    stop.wait(0.5)
+                else:
+                    time.sleep(0.5)
         
-        # print(f'Query on node {node.id}: {len(result._lengths.values())} roads found')
+        # print(f'Query on nodes {missing}: {len(result.lengths)} roads found')
 
-        for length in result._lengths.values():
+        for nodeId in missing:
+            found[nodeId] = []
+        for wayId, meters in result.lengths.items():
 
-            # get the corresponding way for a particular id and eliminate unnecessary tag elements
-            way = result.get_way(length.id)
-            tags = {tag: val for tag, val in way.tags.items() if tag in keepTags}
+            # the lean result already dropped every tag we do not keep
+            nodeIds, tags = result.ways[wayId]
 
             # do mileage and time calculations based on the road length and max speed
-            length_miles = float(length.length) * 0.000621371
+            length_miles = meters * 0.000621371
             speed = 45
             if 'maxspeed' in tags:
                 try:
@@ -549,11 +496,18 @@ class QuadTree:
             time_seconds = (length_miles / speed) * 3600
 
             # get start and end node for each road and create new dictionaries for the endpoints
-            start = way.nodes[0]
-            end = way.nodes[-1]
-            startNode = {'id': start.id, 'lat': float(start.lat), 'long': float(start.lon)}
-            endNode = {'id': end.id, 'lat': float(end.lat), 'long': float(end.lon)}
-
-            # create road dictionary and add to ways list
-            wayData = {'id': length.id, 'length_mi': length_miles, 'time_s': time_seconds, 'tags': tags, 'startNode': startNode, 'endNode': endNode}
-            self.add(Way(wayData))
\ No newline at end of file
+            start = result.nodes[nodeIds[0]]
+            end = result.nodes[nodeIds[-1]]
+            startNode = {'id': nodeIds[0], 'lat': start[0], 'long': start[1]}
+            endNode = {'id': nodeIds[-1], 'lat': end[0], 'long': end[1]}
+
+            # create road dictionary and hand it to every queried node the way runs through
+            wayData = {'id': wayId, 'length_mi': length_miles, 'time_s': time_seconds, 'tags': tags, 'startNode': startNode, 'endNode': endNode}
+            for nodeId in set(nodeIds).intersection(missing):
+                found[nodeId].append(wayData)
+
+        # remember the answers, including nodes with nothing new, so we never pay for these lookups again
+        if self.cache:
+            for nodeId in missing:
+                self.cache.put(nodeId, found[nodeId])
+        return found
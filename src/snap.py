@@ -0,0 +1,187 @@
+#!/opt/homebrew/bin/python3
+
+import os, sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from src import quadtree
+
+# NumPy is optional, without it every point is snapped one at a time with QuadTree.nearestWays
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# points are snapped together per cell of the tree, the deepest one on their path down holding at least this many road ends
+CELL_SIZE = 32
+
+# most points snapped against a cell's candidates at once, which bounds the size of the distance matrices
+CHUNK = 1024
+
+# how many of the nearest candidates of each point are checked for heading the right way
+NEAREST = 16
+
+# radius of the earth in miles, the same as getDistance
+RADIUS = 3956
+
+
+# Haversine distance in miles between arrays of coordinates, which broadcast against each other like any NumPy operation
+def haversine(lat1, lon1, lat2, lon2):
+    lat1, lon1, lat2, lon2 = np.radians(lat1), np.radians(lon1), np.radians(lat2), np.radians(lon2)
+    a = np.sin((lat2 - lat1) / 2)**2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2)**2
+    return RADIUS * 2 * np.arcsin(np.sqrt(a))
+
+
+# the south, north, west and east edges of a box, worked out the same way containsNode does
+def edges(bounds: quadtree.BoundingBox) -> tuple:
+    return (bounds.center[0] - bounds.height / 2, bounds.center[0] + bounds.height / 2,
+            bounds.center[1] - bounds.width / 2, bounds.center[1] + bounds.width / 2)
+
+
+# snaps batches of origin/destination pairs to the start and end ways getEndWays would choose, returning their indices in graph.ways
+# points in the same cell of the tree are scored together against every road end in and around that cell with vectorized
+# Haversine distances. a point is only answered from the cell when its best way is nearer than anything outside the area
+# we gathered could be, and every other point (or every point without NumPy) goes through the exact best first search
+class Snapper:
+    def __init__(self, tree: quadtree.QuadTree, graph) -> None:
+        self.tree = tree
+        self.graph = graph
+        if np is None:
+            return
+
+        # ids and coordinates of both ends of every way, in graph order
+        self.ids = np.array([w.id for w in graph.ways], dtype=np.int64)
+        self.lat = {'start': np.array([w.start.lat for w in graph.ways]), 'end': np.array([w.end.lat for w in graph.ways])}
+        self.lon = {'start': np.array([w.start.lon for w in graph.ways]), 'end': np.array([w.end.lon for w in graph.ways])}
+
+    # returns (start way index for every origin, end way index for every destination), -1 where no way fits
+    # origins and destinations are matching sequences of [lat, lon], as NumPy arrays of shape (n, 2) or plain lists
+    def snap(self, origins, destinations) -> tuple:
+        if np is None:
+            return self.snapScalar(origins, destinations)
+        origins = np.asarray(origins, dtype=float).reshape(-1, 2)
+        destinations = np.asarray(destinations, dtype=float).reshape(-1, 2)
+        return self.snapSide(origins, destinations, 'start'), self.snapSide(destinations, origins, 'end')
+
+    # the plain python version of snap, one best first search per point
+    def snapScalar(self, origins, destinations) -> tuple:
+        starts = [self.nearest(list(o), list(d), 'start') for o, d in zip(origins, destinations)]
+        ends = [self.nearest(list(o), list(d), 'end') for o, d in zip(origins, destinations)]
+        return starts, ends
+
+    # index of the way getClosestWay would pick for one pair, ignoring ways added to the tree after the graph was compiled
+    def nearest(self, start: list, end: list, f: str) -> int:
+        heading = self.tree.heading(start, end, f)
+        found = self.tree.nearestWays(start if f == 'start' else end, 1, f, lambda way: way.id in self.graph.wayIndex and heading(way))
+        return self.graph.wayIndex[found[0][1].id] if found else -1
+
+    # snaps every point to the way whose f end is nearest to it, among the ways heading the right way relative to others
+    def snapSide(self, points, others, f: str):
+        result = np.full(len(points), -1, dtype=np.int64)
+        fallback = []
+        for cell, idx in self.cells(points):
+            if cell is None:
+                fallback.extend(idx.tolist())
+                continue
+            for i in range(0, len(idx), CHUNK):
+                fallback.extend(self.snapCell(cell, idx[i:i + CHUNK], points, others, f, result))
+
+        for i in fallback:
+            start, end = (points[i], others[i]) if f == 'start' else (others[i], points[i])
+            result[i] = self.nearest(start.tolist(), end.tolist(), f)
+        return result
+
+    # splits the points down the tree the same way add places road ends, yielding (cell, point indices) for every cell that
+    # holds points, and (None, indices) for points outside the tree altogether
+    def cells(self, points):
+        lat, lon = points[:, 0], points[:, 1]
+        s, n, w, e = edges(self.tree.bounds)
+        inside = (s <= lat) & (lat <= n) & (w <= lon) & (lon <= e)
+        yield None, np.flatnonzero(~inside)
+
+        # points only move down into a child that still holds CELL_SIZE road ends, the rest stay together in the parent
+        stack = [(self.tree, np.flatnonzero(inside))]
+        while stack:
+            t, idx = stack.pop()
+            if not t.ul:
+                yield t, idx
+                continue
+
+            remaining = np.ones(len(idx), dtype=bool)
+            for child in [t.ul, t.ur, t.ll, t.lr]:
+                s, n, w, e = edges(child.bounds)
+                inside = remaining & (s <= lat[idx]) & (lat[idx] <= n) & (w <= lon[idx]) & (lon[idx] <= e)
+                if child.size >= CELL_SIZE and inside.any():
+                    stack.append((child, idx[inside]))
+                    remaining &= ~inside
+            if remaining.any():
+                yield t, idx[remaining]
+
+    # snaps the points idx inside cell against the ways whose f end lies in the cell widened by half its size on every side,
+    # writing the answers it is sure of into result and returning the indices of the points it could not settle
+    def snapCell(self, cell: quadtree.QuadTree, idx, points, others, f: str, result) -> list:
+        # ends outside the tree are never searched by nearestWays either, so the box stops at the tree's edges
+        s, n, w, e = edges(cell.bounds)
+        rootS, rootN, rootW, rootE = edges(self.tree.bounds)
+        s, n = max(s - cell.bounds.height / 2, rootS), min(n + cell.bounds.height / 2, rootN)
+        w, e = max(w - cell.bounds.width / 2, rootW), min(e + cell.bounds.width / 2, rootE)
+
+        candidates = self.candidates(s, w, n, e, f)
+        if not len(candidates):
+            return idx.tolist()
+
+        lat, lon = points[idx, 0:1], points[idx, 1:2]
+        dist = haversine(lat, lon, self.lat[f][candidates], self.lon[f][candidates])
+
+        # only the NEAREST candidates of every point are checked for heading the right way, a point with none of them fitting
+        # is left for the full search
+        rows = np.arange(len(idx))[:, None]
+        if len(candidates) > NEAREST:
+            near = np.argpartition(dist, NEAREST - 1, axis=1)[:, :NEAREST]
+        else:
+            near = np.broadcast_to(np.arange(len(candidates)), (len(idx), len(candidates)))
+        nearDist = dist[rows, near]
+        checked = nearDist
+        ways = candidates[near]
+
+        # only ways that get us closer to the destination (or come from the direction of the origin) count, just like getClosestWay
+        other = 'end' if f == 'start' else 'start'
+        oLat, oLon = others[idx, 0:1], others[idx, 1:2]
+        toOther = haversine(oLat, oLon, self.lat[other][ways], self.lon[other][ways])
+        toSame = haversine(oLat, oLon, self.lat[f][ways], self.lon[f][ways])
+        nearDist = np.where(toOther < toSame, nearDist, np.inf)
+
+        # the nearest way heading the right way, ties going to the lowest way id just like nearestWays
+        best = np.lexsort((self.ids[ways], nearDist), axis=1)[:, 0]
+        bestDist = nearDist[rows[:, 0], best]
+
+        # a candidate left out of the nearest that is just as close as the best one could win the tie on id, so those points
+        # are left for the full search as well
+        crowded = (dist <= bestDist[:, None]).sum(axis=1) > (checked <= bestDist[:, None]).sum(axis=1)
+
+        # nothing outside the widened box can be nearer than its closest edge: a latitude edge is at least the difference in
+        # latitude away, and a longitude edge at least the distance to that meridian. edges on the tree's own edges have nothing past them
+        latRad, lonRad = np.radians(lat[:, 0]), np.radians(lon[:, 0])
+        bound = np.full(len(idx), np.inf)
+        if s > rootS:
+            bound = np.minimum(bound, (latRad - np.radians(s)) * RADIUS)
+        if n < rootN:
+            bound = np.minimum(bound, (np.radians(n) - latRad) * RADIUS)
+        if w > rootW:
+            bound = np.minimum(bound, np.arcsin(np.clip(np.sin(lonRad - np.radians(w)) * np.cos(latRad), -1, 1)) * RADIUS)
+        if e < rootE:
+            bound = np.minimum(bound, np.arcsin(np.clip(np.sin(np.radians(e) - lonRad) * np.cos(latRad), -1, 1)) * RADIUS)
+
+        sure = np.isfinite(bestDist) & (bestDist < bound) & ~crowded
+        result[idx[sure]] = ways[rows[:, 0], best][sure]
+        return idx[~sure].tolist()
+
+    # graph indices of the ways whose f end lies in the box from south west corner s, w to north east corner n, e
+    def candidates(self, s: float, w: float, n: float, e: float, f: str):
+        wayIndex = self.graph.wayIndex
+        found = set()
+        for leaf in self.tree.leavesIn(s, w, n, e):
+            for way in leaf.ways:
+                if way.id in wayIndex:
+                    found.add(wayIndex[way.id])
+        candidates = np.fromiter(found, dtype=np.int64, count=len(found))
+        lat, lon = self.lat[f][candidates], self.lon[f][candidates]
+        return candidates[(s <= lat) & (lat <= n) & (w <= lon) & (lon <= e)]
@@ -0,0 +1,277 @@
+#!/opt/homebrew/bin/python3
+
+import os, sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import json
+import mmap
+import struct
+from array import array
+from collections.abc import MutableMapping
+from src import quadtree
+
+# a snapshot is a single binary file holding a fully built highway network so startup can skip parsing every json tile
+# layout: header, node table, way table, quadtree records (preorder), leaf way indices, outgoing and incoming adjacency of every
+# node as offsets into a list of edges, then a json list of unique tag dicts
+# an edge is 2 * way index for a way driven forwards and 2 * way index + 1 for its reverse view
+SNAPSHOT_MAGIC = b'TRSN'
+SNAPSHOT_VERSION = 2
+
+HEADER = struct.Struct('<4sIQQQQQQQ')
+NODE = struct.Struct('<qdd')
+WAY = struct.Struct('<qddiii')
+TREE = struct.Struct('<ddddiiII')
+LEAF = struct.Struct('<I')
+EDGE = struct.Struct('<I')
+
+
+# writes the network held by a quadtree out to a snapshot file at path
+# every way in the node index is kept, including the ones with both ends outside the tree's bounds that no leaf holds
+def write(tree: quadtree.QuadTree, path: str) -> None:
+    nodes = {}
+    ways = {}
+    tags = {}
+    nodeRecords = []
+    wayRecords = []
+    treeRecords = []
+    leafRecords = []
+
+    # give every node, way and distinct set of tags a dense index the first time we see it
+    def nodeIndex(node: quadtree.Node) -> int:
+        if node.id not in nodes:
+            nodes[node.id] = len(nodeRecords)
+            nodeRecords.append(NODE.pack(node.id, node.lat, node.lon))
+        return nodes[node.id]
+
+    def wayIndex(way: quadtree.Way) -> int:
+        if way.id not in ways:
+            key = json.dumps(way.tags, sort_keys=True)
+            if key not in tags:
+                tags[key] = len(tags)
+            ways[way.id] = len(wayRecords)
+            wayRecords.append(WAY.pack(way.id, way.length, way.time, nodeIndex(way.start), nodeIndex(way.end), tags[key]))
+        return ways[way.id]
+
+    # number the ways in the order the index holds them, so the loaded index iterates them in the same order
+    for way in tree.index.ways.values():
+        wayIndex(way)
+
+    # walk the tree in preorder (ul, ur, ll, lr) so the reader can rebuild it without re-inserting anything
+    stack = [tree]
+    while stack:
+        t = stack.pop()
+        b = t.bounds
+        sw = [b.center[0] - b.height / 2, b.center[1] - b.width / 2]
+        ne = [sw[0] + b.height, sw[1] + b.width]
+        leaf = 0 if t.ul else 1
+        treeRecords.append(TREE.pack(sw[0], sw[1], ne[0], ne[1], t.size, leaf, len(leafRecords), len(t.ways)))
+        for way in t.ways:
+            leafRecords.append(LEAF.pack(wayIndex(way)))
+        if t.ul:
+            stack.extend([t.lr, t.ll, t.ur, t.ul])
+
+    # an index loaded from a snapshot only holds the connections decoded so far, so decode the rest before writing them out
+    if isinstance(tree.index, MappedIndex):
+        for nodeId in tree.index.nodeRows:
+            tree.index.load(nodeId)
+
+    # the adjacency lists of the index in node order, so the reader can hand them over as they are instead of adding every way again
+    nodeIds = list(nodes)
+    adjacency = []
+    for table in [tree.index.outgoing, tree.index.incoming]:
+        offsets = array('I', [0])
+        edges = array('I')
+        for nodeId in nodeIds:
+            edges.extend(2 * ways[edge.id] + (0 if edge.forward else 1) for edge in table.get(nodeId, []))
+            offsets.append(len(edges))
+        adjacency.append((offsets, edges))
+
+    tagBlob = json.dumps([json.loads(k) for k in tags]).encode('utf-8')
+    header = HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, len(nodeRecords), len(wayRecords), len(treeRecords), len(leafRecords),
+                         len(adjacency[0][1]), len(adjacency[1][1]), len(tagBlob))
+
+    # write to a temporary file first so a reader never maps a half written snapshot
+    tmp = path + '.tmp'
+    with open(tmp, 'wb') as file:
+        file.write(header)
+        for records in [nodeRecords, wayRecords, treeRecords, leafRecords]:
+            file.write(b''.join(records))
+        for offsets, edges in adjacency:
+            file.write(packEdges(offsets))
+            file.write(packEdges(edges))
+        file.write(tagBlob)
+    os.replace(tmp, path)
+
+
+# memory maps a snapshot file and rebuilds the quadtree it describes
+# the mapping stays open for as long as the tree is used, roads are only decoded from it when a search first reaches them
+def read(path: str) -> quadtree.QuadTree:
+    with open(path, 'rb') as file:
+        mm = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    return _read(memoryview(mm))
+
+
+# edge arrays are stored little endian whatever the machine writing or reading them
+def packEdges(values: array) -> bytes:
+    if sys.byteorder != 'little':
+        values = array('I', values)
+        values.byteswap()
+    return values.tobytes()
+
+
+def unpackEdges(buf: memoryview) -> array:
+    values = array('I')
+    values.frombytes(buf)
+    if sys.byteorder != 'little':
+        values.byteswap()
+    return values
+
+
+def _read(buf: memoryview) -> quadtree.QuadTree:
+    magic, version, nodeCount, wayCount, treeCount, leafCount, outCount, inCount, tagBytes = HEADER.unpack_from(buf, 0)
+    if magic != SNAPSHOT_MAGIC:
+        raise ValueError('File is not a TriRoutes network snapshot')
+    if version != SNAPSHOT_VERSION:
+        raise ValueError(f'Snapshot version {version} does not match expected version {SNAPSHOT_VERSION}, recompile the network')
+
+    # slice each section straight out of the mapping
+    offset = HEADER.size
+    sections = []
+    for count, record in [(nodeCount, NODE), (wayCount, WAY), (treeCount, TREE), (leafCount, LEAF),
+                          (nodeCount + 1, EDGE), (outCount, EDGE), (nodeCount + 1, EDGE), (inCount, EDGE)]:
+        sections.append(buf[offset:offset + count * record.size])
+        offset += count * record.size
+    tagList = json.loads(bytes(buf[offset:offset + tagBytes]).decode('utf-8'))
+    index = MappedIndex(sections, tagList)
+
+    # rebuild the tree from its preorder records, each internal node's children follow it in ul, ur, ll, lr order
+    root = None
+    pending = []
+    for swLat, swLon, neLat, neLon, size, leaf, start, count in TREE.iter_unpack(sections[2]):
+        t = MappedTree(quadtree.BoundingBox([swLat, swLon], [neLat, neLon]), index, start, count)
+        t.size = size
+
+        if root is None:
+            root = t
+        else:
+            parent, slot = pending.pop()
+            setattr(parent, slot, t)
+            t.level = parent.level + 1
+
+        if not leaf:
+            pending.extend([(t, 'lr'), (t, 'll'), (t, 'ur'), (t, 'ul')])
+
+    root.index = index
+    return root
+
+
+# node index over the sections of a mapped snapshot
+# nodes, ways and the roads connected at a node only become python objects the first time something asks for them, so loading
+# just decodes the ids, and the pages of the file stay shared between every process routing on the same snapshot
+# nodes only holds the nodes decoded so far, ways can be used like the dictionary of every way by id it is on a plain index
+class MappedIndex(quadtree.NodeIndex):
+    def __init__(self, sections: list, tagList: list) -> None:
+        super().__init__()
+        self.nodeBuf, self.wayBuf, _, leafBuf = sections[:4]
+        self.leaves = unpackEdges(leafBuf)
+        self.outOffsets, self.outEdges, self.inOffsets, self.inEdges = [unpackEdges(section) for section in sections[4:]]
+        self.tagList = tagList
+        self.tags = {tuple(sorted(tags.items())): tags for tags in tagList}
+
+        # rows of every node and way by id, and the objects already decoded from each row
+        self.nodeRows = {nodeId: i for i, (nodeId, _, _) in enumerate(NODE.iter_unpack(self.nodeBuf))}
+        self.nodeCache = [None] * len(self.nodeRows)
+        self.wayCache = [None] * (len(self.wayBuf) // WAY.size)
+        self.ways = MappedWays(self, {record[0]: i for i, record in enumerate(WAY.iter_unpack(self.wayBuf))})
+
+    def node(self, row: int) -> quadtree.Node:
+        node = self.nodeCache[row]
+        if node is None:
+            node = quadtree.Node.__new__(quadtree.Node)
+            node.id, node.lat, node.lon = NODE.unpack_from(self.nodeBuf, row * NODE.size)
+            self.nodeCache[row] = self.nodes[node.id] = node
+        return node
+
+    def way(self, row: int) -> quadtree.Way:
+        way = self.wayCache[row]
+        if way is None:
+            i, length, time, s, e, t = WAY.unpack_from(self.wayBuf, row * WAY.size)
+            way = self.wayCache[row] = quadtree.Way.fromParts(i, length, time, self.tagList[t], self.node(s), self.node(e))
+        return way
+
+    # the directed way an edge of the adjacency stands for
+    def edge(self, e: int) -> quadtree.Way:
+        return self.way(e >> 1).reverse() if e & 1 else self.way(e >> 1)
+
+    # decodes the stored roads leaving and arriving at a node into outgoing and incoming, the first time the node is asked for
+    def load(self, nodeId: int) -> None:
+        row = self.nodeRows.get(nodeId)
+        if row is None:
+            return
+        self.node(row)
+        for table, offsets, edges in [(self.outgoing, self.outOffsets, self.outEdges), (self.incoming, self.inOffsets, self.inEdges)]:
+            if nodeId not in table:
+                table[nodeId] = [self.edge(e) for e in edges[offsets[row]:offsets[row + 1]]]
+
+    # roads added later (like ones from Overpass) are appended to the stored ones at their nodes, so those are decoded first
+    def add(self, way: quadtree.Way) -> bool:
+        if way.id in self.ways:
+            return False
+        self.load(way.start.id)
+        self.load(way.end.id)
+        return super().add(way)
+
+    def getConnected(self, way: quadtree.Way) -> list:
+        if way.end.id not in self.outgoing:
+            self.load(way.end.id)
+        return self.outgoing.get(way.end.id, [])
+
+
+# every way of a mapped index by id, decoding a way when it is looked up and keeping ways added after loading on the side
+class MappedWays(MutableMapping):
+    def __init__(self, index: MappedIndex, rows: dict) -> None:
+        self.index = index
+        self.rows = rows
+        self.added = {}
+
+    def __getitem__(self, wayId: int) -> quadtree.Way:
+        if wayId in self.rows:
+            return self.index.way(self.rows[wayId])
+        return self.added[wayId]
+
+    def __contains__(self, wayId) -> bool:
+        return wayId in self.rows or wayId in self.added
+
+    def __setitem__(self, wayId: int, way: quadtree.Way) -> None:
+        if wayId in self.rows:
+            raise KeyError(f'Way {wayId} is already in the snapshot')
+        self.added[wayId] = way
+
+    def __delitem__(self, wayId: int) -> None:
+        raise TypeError('Ways cannot be removed from a snapshot')
+
+    def __iter__(self):
+        yield from self.rows
+        yield from self.added
+
+    def __len__(self) -> int:
+        return len(self.rows) + len(self.added)
+
+
+# quadtree cell loaded from a snapshot, whose ways are decoded from the leaf records the first time they are read
+class MappedTree(quadtree.QuadTree):
+    def __init__(self, bounds: quadtree.BoundingBox, mapped: MappedIndex, start: int, count: int) -> None:
+        super().__init__(bounds)
+        self.mapped = mapped
+        self.start = start
+        self.count = count
+        self._ways = None
+
+    @property
+    def ways(self) -> list:
+        if self._ways is None:
+            self._ways = [self.mapped.way(i) for i in self.mapped.leaves[self.start:self.start + self.count]]
+        return self._ways
+
+    @ways.setter
+    def ways(self, ways: list) -> None:
+        self._ways = ways
@@ -0,0 +1,123 @@
+#!/opt/homebrew/bin/python3
+
+import os, sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from math import floor
+import gzip
+import json
+import re
+
+# a tile store is a folder of json road files split up by location, plus a manifest.json listing every shard as
+# {'bbox': [south, west, north, east], 'file': name, 'ways': count} so a network can load only the part of the country it needs
+# the shard bbox covers both ends of every road in it, which is also how gethwdata.py records its tiles, so its output can be read the same way
+MANIFEST = 'manifest.json'
+
+# size in degrees of the grid used to find the shards around a point quickly
+GRID = 1.0
+
+# how much of a road file is read at a time while streaming it
+CHUNK_SIZE = 1 << 16
+
+
+# road files can be plain json or gzip compressed json ending in .json.gz
+def isTile(fileName: str) -> bool:
+    return fileName != MANIFEST and (fileName.endswith('.json') or fileName.endswith('.json.gz'))
+
+
+def openTile(path: str, mode: str = 'r'):
+    if path.endswith('.gz'):
+        return gzip.open(path, mode + 't', encoding='utf-8')
+    return open(path, mode, encoding='utf-8')
+
+
+# yields every road dictionary in a {tile: {id: road}} file one at a time, so only the road being read is ever held in memory
+def iterWays(path: str):
+    decoder = json.JSONDecoder()
+    skip = re.compile(r'[\s,:]*')
+    depth = 0
+    buf = ''
+    eof = False
+    with openTile(path) as file:
+        while True:
+            pos = 0
+            while True:
+                pos = skip.match(buf, pos).end()
+                if pos >= len(buf):
+                    break
+
+                # the file and tile objects are stepped into, everything else is read whole
+                if buf[pos] == '{' and depth < 2:
+                    depth += 1
+                    pos += 1
+                    continue
+                if buf[pos] == '}':
+                    depth -= 1
+                    pos += 1
+                    continue
+                try:
+                    value, end = decoder.raw_decode(buf, pos)
+                except json.JSONDecodeError:
+                    # the key or road continues in the next chunk
+                    if eof:
+                        raise
+                    break
+                if depth == 2 and isinstance(value, dict):
+                    yield value
+                pos = end
+            buf = buf[pos:]
+
+            if eof:
+                break
+            data = file.read(CHUNK_SIZE)
+            if not data:
+                eof = True
+            buf += data
+
+
+# reads a road file into compact records for loading in another process, returning (tag keys, records)
+# each record is (id, length, time, tag index, start id, start lat, start lon, end id, end lat, end lon), and every distinct
+# tag dictionary is sent once as a json key so the receiver can share one copy between every road that has it
+def readCompact(path: str) -> tuple:
+    tags = {}
+    records = []
+    for way in iterWays(path):
+        key = json.dumps(way['tags'], sort_keys=True)
+        if key not in tags:
+            tags[key] = len(tags)
+        start, end = way['startNode'], way['endNode']
+        records.append((way['id'], way['length_mi'], way['time_s'], tags[key], start['id'], start['lat'], start['long'], end['id'], end['lat'], end['long']))
+    return list(tags), records
+
+
+class TileStore:
+    def __init__(self, folder: str) -> None:
+        self.folder = folder
+        with open(os.path.join(folder, MANIFEST), 'r') as file:
+            self.shards = json.load(file)['tiles']
+
+        # every grid cell a shard's bbox touches points back to that shard
+        self.grid = {}
+        for key, shard in self.shards.items():
+            s, w, n, e = shard['bbox']
+            for row in range(floor(s / GRID), floor(n / GRID) + 1):
+                for col in range(floor(w / GRID), floor(e / GRID) + 1):
+                    self.grid.setdefault((row, col), []).append(key)
+
+    # keys of the shards whose bbox overlaps the box from south west corner s, w to north east corner n, e
+    def intersecting(self, s: float, w: float, n: float, e: float) -> list:
+        keys = set()
+        for row in range(floor(s / GRID), floor(n / GRID) + 1):
+            for col in range(floor(w / GRID), floor(e / GRID) + 1):
+                for key in self.grid.get((row, col), []):
+                    bs, bw, bn, be = self.shards[key]['bbox']
+                    if bs <= n and s <= bn and bw <= e and w <= be:
+                        keys.add(key)
+        return sorted(keys)
+
+    # keys of the shards whose bbox contains a point
+    def at(self, lat: float, lon: float) -> list:
+        return self.intersecting(lat, lon, lat, lon)
+
+    # every road dictionary in a shard
+    def load(self, key: str):
+        return iterWays(os.path.join(self.folder, self.shards[key]['file']))